@@ -4,11 +4,16 @@ AI代理服务 - 将Web界面的请求转发到AI模型
 运行在 8001 端口，然后通过Nginx反向代理到5000端口的/api/chat路径
 """
 
-from flask import Flask, request, jsonify
-import requests
+import os
+import time
+from flask import Flask, request, jsonify, Response, stream_with_context
 import json
 import logging
 
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from src.llm_client import SyncLLMClient, LLMError, format_sse, LLM_FIRST_TOKEN_SECONDS, LLM_STREAM_SECONDS
+
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,55 +23,45 @@ app = Flask(__name__)
 # ========== 配置你的AI模型 ==========
 # 选择1: DeepSeek API（免费，推荐）
 # 到 https://platform.deepseek.com/ 注册获取API密钥
-DEEPSEEK_API_KEY = "sk-你的DeepSeek密钥"
-DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-你的DeepSeek密钥")
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
 
 # 选择2: 本地模型（如果你有）
-# LOCAL_MODEL_URL = "http://localhost:7860/chat"
+LOCAL_MODEL_URL = os.getenv("LOCAL_MODEL_URL", "http://localhost:7860/chat")
+
+# 共享的连接池客户端：长连接复用、超时和重试见 src/llm_client.py
+llm = SyncLLMClient()
+
+def build_messages(question):
+    return [
+        {
+            "role": "system", 
+            "content": "你是专业的智能客服助手，回答要友好、准确、有帮助。"
+        },
+        {"role": "user", "content": question}
+    ]
 
 def call_deepseek(question):
     """调用DeepSeek API"""
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": "deepseek-chat",
-        "messages": [
-            {
-                "role": "system", 
-                "content": "你是专业的智能客服助手，回答要友好、准确、有帮助。"
-            },
-            {"role": "user", "content": question}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 2000
-    }
+    messages = build_messages(question)
     
     try:
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=30)
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            return f"API调用失败: {response.status_code} - {response.text}"
+        return llm.chat(DEEPSEEK_BASE_URL, DEEPSEEK_API_KEY, "deepseek-chat", messages,
+                        temperature=0.7, max_tokens=2000, timeout=30)
+    except LLMError as e:
+        return str(e)
     except Exception as e:
         return f"请求失败: {str(e)}"
 
 def call_local_model(question):
     """调用本地模型（如果你有）"""
     try:
-        response = requests.post(
-            "http://localhost:7860/chat",
-            json={"question": question},
-            timeout=30
-        )
-        if response.status_code == 200:
-            return response.json().get("answer", "未收到回答")
-        else:
+        return llm.post_json(LOCAL_MODEL_URL, {"question": question}, timeout=30).get("answer", "未收到回答")
+    except LLMError as e:
+        if e.status_code is not None:
             return "本地模型服务异常"
-    except:
+        return "无法连接到本地模型"
+    except Exception:
         return "无法连接到本地模型"
 
 @app.route('/health')
@@ -104,5 +99,44 @@ def chat():
             "status": "error"
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """流式聊天接口 - 以SSE逐段返回DeepSeek的输出"""
+    data = request.json or {}
+    question = data.get('question', '')
+    if not question:
+        return jsonify({"answer": "请提供问题内容", "status": "error"}), 400
+    
+    logger.info(f"收到流式问题: {question[:50]}...")
+    
+    def events():
+        start = time.perf_counter()
+        first_token = None
+        try:
+            for chunk in llm.stream_chat(DEEPSEEK_BASE_URL, DEEPSEEK_API_KEY, "deepseek-chat",
+                                         build_messages(question), temperature=0.7, max_tokens=2000, timeout=30):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    LLM_FIRST_TOKEN_SECONDS.labels(model="deepseek-chat").observe(first_token)
+                yield format_sse({"token": chunk})
+            total = time.perf_counter() - start
+            LLM_STREAM_SECONDS.labels(model="deepseek-chat").observe(total)
+            yield format_sse({
+                "done": True,
+                "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                "total_ms": round(total * 1000, 1)
+            })
+        except Exception as e:
+            logger.error(f"流式请求失败: {e}")
+            yield format_sse({"error": f"请求失败: {str(e)}"}, event="error")
+    
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus指标（含流式接口的首token时间）"""
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8001, debug=False)
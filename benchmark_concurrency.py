@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+并发基准测试 - 检查/ask的推理是否阻塞事件循环
+以固定并发持续请求/ask，同时每隔一小段时间探测/health，
+分别统计两者的p50/p99延迟和被拒绝（503）的请求数。
+
+推理在事件循环上执行时，/health会被慢查询拖住，p99接近/ask的延迟；
+推理移到线程池后，/health的p99应保持在毫秒级。
+
+用法（先启动服务）:
+    python benchmark_concurrency.py --url http://localhost:8000 --concurrency 32 --duration 20
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+QUESTIONS = [
+    "退货需要几天时间",
+    "怎么联系客服",
+    "什么商品不能退货",
+    "运费谁承担",
+    "退款多久到账",
+]
+
+
+async def ask_worker(client, url, deadline, latencies, status_counts, worker_id):
+    """持续发送问题直到截止时间"""
+    i = worker_id
+    while time.perf_counter() < deadline:
+        question = f"{QUESTIONS[i % len(QUESTIONS)]} #{i}"  # 加编号避免全部命中缓存
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{url}/ask", json={"question": question})
+            status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+        except httpx.HTTPError:
+            status_counts["error"] = status_counts.get("error", 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def health_probe(client, url, deadline, latencies, interval):
+    """周期性探测/health"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            await client.get(f"{url}/health")
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+def summarize(name, latencies):
+    if not latencies:
+        print(f"{name:8s} 无成功请求")
+        return
+    ms = np.array(latencies) * 1000
+    print(f"{name:8s} n={len(ms):5d}  p50={np.percentile(ms, 50):8.1f}ms  "
+          f"p99={np.percentile(ms, 99):8.1f}ms  max={ms.max():8.1f}ms")
+
+
+async def main(args):
+    deadline = time.perf_counter() + args.duration
+    ask_latencies, health_latencies, status_counts = [], [], {}
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        tasks = [
+            ask_worker(client, args.url, deadline, ask_latencies, status_counts, i)
+            for i in range(args.concurrency)
+        ]
+        tasks.append(health_probe(client, args.url, deadline, health_latencies, args.probe_interval))
+        await asyncio.gather(*tasks)
+
+    print(f"=== 并发={args.concurrency} 持续={args.duration}s ===")
+    summarize("/ask", ask_latencies)
+    summarize("/health", health_latencies)
+    print(f"/ask 状态码分布: {status_counts}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发基准测试")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="/health探测间隔（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+嵌入生成吞吐量基准测试
+对比逐条 get_embedding 与批量 get_embeddings 的速度（docs/sec）
+
+用法:
+    python benchmark_embedding.py --docs 500 --batch-sizes 8,16,32,64
+"""
+
+import argparse
+import random
+import time
+
+from src.vector_search import VectorSearch
+
+SAMPLE_SENTENCES = [
+    "自签收之日起7天内，商品未使用且包装完好可申请无理由退货。",
+    "退款将在收到退货商品后3-5个工作日内原路返回。",
+    "定制商品、生鲜食品以及已拆封的贴身衣物不支持退货。",
+    "因质量问题产生的退货运费由商家承担。",
+    "客服热线400-123-4567，服务时间为每天9:00-21:00。",
+    "订单发货后可在个人中心查看物流信息。",
+]
+
+
+def make_documents(count: int, seed: int = 42):
+    """生成长度不一的模拟文档"""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        n = rng.randint(1, 12)
+        docs.append("".join(rng.choice(SAMPLE_SENTENCES) for _ in range(n)))
+    return docs
+
+
+def run_benchmark(searcher: VectorSearch, documents, batch_sizes):
+    """运行基准测试并打印结果"""
+    # 预热，避免首次调用的初始化开销影响结果
+    searcher.get_embeddings(documents[:8])
+
+    start = time.perf_counter()
+    for doc in documents:
+        searcher.get_embedding(doc)
+    elapsed = time.perf_counter() - start
+    baseline = len(documents) / elapsed
+    print(f"逐条编码:           {baseline:8.1f} docs/sec")
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        searcher.get_embeddings(documents, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        throughput = len(documents) / elapsed
+        print(f"批量编码 batch={batch_size:<4d} {throughput:8.1f} docs/sec  (x{throughput / baseline:.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="嵌入生成吞吐量基准测试")
+    parser.add_argument("--docs", type=int, default=500, help="模拟文档数量")
+    parser.add_argument("--batch-sizes", default="8,16,32,64", help="逗号分隔的批大小列表")
+    args = parser.parse_args()
+
+    print("=== 嵌入吞吐量基准测试 ===")
+    documents = make_documents(args.docs)
+    searcher = VectorSearch()
+    run_benchmark(searcher, documents, [int(b) for b in args.batch_sizes.split(",")])
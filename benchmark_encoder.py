@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+编码器后端基准测试 - 对比 torch / onnx / onnx-int8 的延迟和内存占用
+每个后端在独立子进程中测量，RSS互不干扰。
+
+用法:
+    python benchmark_encoder.py --model /app/models/bge-small-zh --backends torch,onnx,onnx-int8
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import psutil
+
+QUERY = "退货需要几天时间"
+DOCUMENT = "自签收之日起7天内，商品未使用且包装完好可申请无理由退货。退款将在收到退货商品后3-5个工作日内原路返回。"
+
+
+def measure(backend: str, model: str, rounds: int) -> dict:
+    """在当前进程中加载指定后端并测量"""
+    from src.encoders import load_encoder
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+    encoder = load_encoder(backend, model)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = process.memory_info().rss
+
+    # 预热
+    encoder.encode([QUERY])
+
+    single = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        encoder.encode([QUERY])
+        single.append(time.perf_counter() - start)
+
+    batch = [DOCUMENT] * 32
+    batched = []
+    for _ in range(max(rounds // 10, 3)):
+        start = time.perf_counter()
+        encoder.encode(batch)
+        batched.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": round((rss_loaded - rss_before) / 1024 / 1024, 1),
+        "peak_rss_mb": round(process.memory_info().rss / 1024 / 1024, 1),
+        "query_p50_ms": round(float(np.percentile(single, 50)) * 1000, 2),
+        "query_p99_ms": round(float(np.percentile(single, 99)) * 1000, 2),
+        "batch32_docs_per_sec": round(len(batch) / float(np.median(batched)), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="编码器后端基准测试")
+    parser.add_argument("--model", default="/app/models/bge-small-zh")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model, args.rounds)))
+        sys.exit(0)
+
+    print("=== 编码器后端基准测试 ===")
+    print(f"{'后端':10s} {'加载(s)':>8s} {'模型RSS(MB)':>12s} {'峰值RSS(MB)':>12s} "
+          f"{'查询p50(ms)':>12s} {'查询p99(ms)':>12s} {'批量docs/s':>11s}")
+    for backend in args.backends.split(","):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--model", args.model, "--rounds", str(args.rounds)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['backend']:10s} {r['load_seconds']:8.2f} {r['model_rss_mb']:12.1f} {r['peak_rss_mb']:12.1f} "
+              f"{r['query_p50_ms']:12.2f} {r['query_p99_ms']:12.2f} {r['batch32_docs_per_sec']:11.1f}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+混合检索基准测试 - 纯向量检索 对比 BM25 + 向量检索（RRF融合）
+统计两种模式的查询延迟和 recall@k。
+
+recall@k：前k个结果中出现包含期望答案片段的文本块即算召回。
+评测集为JSONL，每行 {"question": "...", "answer_contains": "..."}；
+不指定时使用内置的小评测集（对应 data/return_policy.txt 的示例内容）。
+
+用法:
+    python benchmark_hybrid.py --corpus data/return_policy.txt --qa qa.jsonl --top-k 3
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from src.document_processor import DocumentProcessor
+from src.vector_search import VectorSearch
+
+DEFAULT_QA = [
+    {"question": "退货政策是什么", "answer_contains": "无理由退货"},
+    {"question": "多少天可以退货", "answer_contains": "30天"},
+    {"question": "物流要几天", "answer_contains": "工作日"},
+    {"question": "客服电话", "answer_contains": "400-123-4567"},
+    {"question": "400-123-4567是什么号码", "answer_contains": "400-123-4567"},
+]
+
+
+def load_qa(path):
+    if not path:
+        return DEFAULT_QA
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(searcher: VectorSearch, qa, top_k: int, rounds: int):
+    """返回 (recall@k, 延迟列表毫秒)"""
+    hits = 0
+    latencies = []
+    for item in qa:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            results = searcher.search(item["question"], top_k=top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if any(item["answer_contains"] in doc for doc in results):
+            hits += 1
+    return hits / len(qa), np.array(latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="混合检索基准测试")
+    parser.add_argument("--corpus", default="data/return_policy.txt")
+    parser.add_argument("--qa", help="评测集JSONL文件")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=5, help="每个问题重复查询次数（用于统计延迟）")
+    args = parser.parse_args()
+
+    documents = DocumentProcessor().load_documents(args.corpus)
+    qa = load_qa(args.qa)
+
+    results = {}
+    for mode in ("dense", "hybrid"):
+        # 使用临时目录的NumPy索引，不影响线上向量库
+        with tempfile.TemporaryDirectory(prefix=f"bench_{mode}_") as path:
+            searcher = VectorSearch(persist_directory=path, index_backend="numpy", retrieval_mode=mode)
+            searcher.add_documents(documents)
+            results[mode] = evaluate(searcher, qa, args.top_k, args.rounds)
+
+    print(f"\n=== 混合检索基准测试（{len(documents)} 个文本块，{len(qa)} 个问题）===")
+    print(f"{'模式':8s} {'recall@' + str(args.top_k):>10s} {'p50(ms)':>10s} {'p99(ms)':>10s}")
+    for mode, (recall, latencies) in results.items():
+        print(f"{mode:8s} {recall:10.3f} {np.percentile(latencies, 50):10.2f} {np.percentile(latencies, 99):10.2f}")
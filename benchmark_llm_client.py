@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+大模型客户端基准测试 - 每次新建连接的 requests.post 对比 共享连接池的 LLMClient
+对本地模拟大模型服务（stub_llm_server.py）以固定并发发送请求，统计吞吐和延迟分位数。
+模拟服务的生成延迟固定，两种方式的差异主要来自建立连接（HTTPS时还有TLS握手）的开销。
+注意：本机明文HTTP下建连几乎没有成本，httpx单请求的CPU开销比requests高，结果可能反而不如requests；
+测HTTPS（模拟服务加 --ssl-keyfile/--ssl-certfile，本脚本加 --insecure）才接近真实的远程API调用。
+
+用法（先启动模拟服务）:
+    python stub_llm_server.py --port 9000 --latency-ms 50
+    python benchmark_llm_client.py --base-url http://127.0.0.1:9000 --requests 500 --concurrency 32
+"""
+
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from src.llm_client import LLMClient, HTTP2_AVAILABLE
+
+MESSAGES = [{"role": "user", "content": "退货需要几天时间"}]
+
+
+def run_requests(base_url: str, total: int, concurrency: int, verify: bool):
+    """旧实现：线程池中每个请求调用一次 requests.post（无Session，每次新建连接）"""
+    def call(_):
+        start = time.perf_counter()
+        response = requests.post(f"{base_url}/chat/completions",
+                                 json={"model": "stub", "messages": MESSAGES},
+                                 headers={"Authorization": "Bearer stub"}, timeout=30, verify=verify)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, range(total)))
+    return time.perf_counter() - start, np.array(latencies)
+
+
+async def run_pooled(base_url: str, total: int, concurrency: int, http2: bool, verify: bool):
+    """新实现：共享连接池的异步客户端"""
+    client = LLMClient(max_connections=concurrency, max_keepalive=concurrency, http2=http2, verify=verify)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            await client.chat(base_url, "stub", "stub", MESSAGES)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return elapsed, np.array(latencies)
+
+
+def report(name: str, elapsed: float, latencies: np.ndarray):
+    print(f"{name:20s} {len(latencies) / elapsed:10.1f} {np.percentile(latencies, 50) * 1000:10.1f} "
+          f"{np.percentile(latencies, 99) * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="大模型客户端基准测试")
+    parser.add_argument("--base-url", default="http://127.0.0.1:9000")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--insecure", action="store_true", help="HTTPS时不校验证书（模拟服务使用自签名证书）")
+    args = parser.parse_args()
+    verify = not args.insecure
+
+    results = [("requests.post", *run_requests(args.base_url, args.requests, args.concurrency, verify))]
+    results.append(("LLMClient http/1.1",
+                    *asyncio.run(run_pooled(args.base_url, args.requests, args.concurrency, False, verify))))
+    if args.base_url.startswith("https") and HTTP2_AVAILABLE:
+        # HTTP/2 需要TLS（ALPN协商）和h2
+        results.append(("LLMClient http/2",
+                        *asyncio.run(run_pooled(args.base_url, args.requests, args.concurrency, True, verify))))
+
+    print(f"\n=== 大模型客户端基准测试（{args.requests} 个请求，并发 {args.concurrency}）===")
+    print(f"{'客户端':20s} {'吞吐(req/s)':>10s} {'p50(ms)':>10s} {'p99(ms)':>10s}")
+    for name, elapsed, latencies in results:
+        report(name, elapsed, latencies)
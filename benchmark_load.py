@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+负载测试 - 回放JSONL问题语料，按目标QPS或固定并发压测 /ask，结果保存为JSON便于跨提交对比
+两种模式：
+    --qps N           开环：按固定间隔（加 --poisson 为泊松到达）发送，不等待前一个请求返回；
+                      延迟从计划发送时刻算起，服务变慢时排队的时间也计入（避免协同遗漏）
+    --concurrency N   闭环：N 个客户端各自循环发送，收到响应后立即发下一个
+
+语料每行一个JSON：{"question": "..."}，也可以是 {"body": {...}}（原样作为请求体）或直接是字符串；
+不指定语料时使用 load_questions.jsonl。
+
+--serve 会先启动本地模拟大模型服务（stub_llm_server.py）和被测服务（uvicorn子进程），
+并把大模型地址指向模拟服务，不需要网络和API密钥。服务运行在子进程中，不与压测客户端争用GIL。
+
+用法:
+    python benchmark_load.py --url http://localhost:8000 --qps 20 --duration 30
+    python benchmark_load.py --serve src.fastapi_service:app --endpoint /api/chat --concurrency 16 --requests 500
+    python benchmark_load.py --concurrency 8 --requests 200 --compare benchmark_results/load_abc1234_20240101-120000.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_questions.jsonl")
+
+
+def load_corpus(path: str) -> List[dict]:
+    """读取JSONL语料，返回请求体列表"""
+    bodies = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                bodies.append({"question": item})
+            elif "body" in item:
+                bodies.append(item["body"])
+            else:
+                bodies.append({"question": item["question"]})
+    if not bodies:
+        raise ValueError(f"语料为空: {path}")
+    return bodies
+
+
+def git_revision() -> dict:
+    """当前提交和工作区是否有未提交的修改"""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             text=True, stderr=subprocess.DEVNULL).strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": False}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, paths: List[str], timeout: float):
+    """
+    轮询健康检查接口直到返回200
+
+    paths 按优先级排列：只有前一个接口返回404（服务没有该接口）时才改用下一个，
+    /readyz 返回503（模型仍在加载）时不会因为 /health 已是200而提前开始压测
+    """
+    deadline = time.monotonic() + timeout
+    paths = list(paths)
+    while time.monotonic() < deadline:
+        try:
+            status = httpx.get(f"{url}{paths[0]}", timeout=2).status_code
+            if status == 200:
+                return
+            if status == 404 and len(paths) > 1:
+                paths.pop(0)
+                continue
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"等待服务就绪超时: {url}{paths[0]}")
+
+
+def start_services(app: str, llm_latency_ms: float, tokens_per_second: float, timeout: float):
+    """启动模拟大模型服务和被测服务，返回 (被测服务地址, 子进程列表)"""
+    llm_port, app_port = free_port(), free_port()
+    llm_url = f"http://127.0.0.1:{llm_port}"
+    stub = subprocess.Popen(
+        [sys.executable, "stub_llm_server.py", "--port", str(llm_port),
+         "--latency-ms", str(llm_latency_ms), "--tokens-per-second", str(tokens_per_second)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    # 各服务读取的大模型地址都指向模拟服务
+    env = {**os.environ, "MODEL_TYPE": "deepseek",
+           "DEEPSEEK_BASE_URL": llm_url, "DEEPSEEK_API_KEY": "stub",
+           "OPENAI_BASE_URL": llm_url, "OPENAI_API_KEY": "stub",
+           "LOCAL_MODEL_URL": f"{llm_url}/chat"}
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(app_port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    processes = [service, stub]
+    url = f"http://127.0.0.1:{app_port}"
+    try:
+        wait_until_ready(llm_url, ["/stats"], timeout)
+        wait_until_ready(url, ["/readyz", "/health"], timeout)
+    except BaseException:
+        stop_services(processes)
+        raise
+    print(f"🤖 模拟大模型服务: {llm_url}（延迟 {llm_latency_ms}ms）")
+    print(f"🚀 被测服务 {app}: {url}")
+    return url, processes
+
+
+def stop_services(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status_codes: Counter = Counter()
+        self.errors: Counter = Counter()
+
+    def record(self, latency: float, status: Optional[int] = None, error: Optional[str] = None):
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[error] += 1
+        else:
+            self.status_codes[status] += 1
+            if status >= 400:
+                self.errors[f"HTTP {status}"] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        total = len(self.latencies)
+        failed = sum(self.errors.values())
+        latencies = np.array(self.latencies) * 1000 if total else np.zeros(1)
+        return {
+            "requests": total,
+            "ok": total - failed,
+            "errors": failed,
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round((total - failed) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(float(latencies.mean()), 2),
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+                "p99": round(float(np.percentile(latencies, 99)), 2),
+                "max": round(float(latencies.max()), 2)
+            },
+            "status_codes": {str(code): count for code, count in sorted(self.status_codes.items())},
+            "error_types": dict(self.errors.most_common())
+        }
+
+
+async def send(client: httpx.AsyncClient, url: str, body: dict, started: float, result: LoadResult):
+    """发送一个请求并记录延迟（started 为计划发送时刻）"""
+    try:
+        response = await client.post(url, json=body)
+        result.record(time.perf_counter() - started, status=response.status_code)
+    except httpx.HTTPError as e:
+        result.record(time.perf_counter() - started, error=type(e).__name__)
+
+
+def next_body(bodies: List[dict], i: int, unique: bool) -> dict:
+    body = bodies[i % len(bodies)]
+    if unique and "question" in body:
+        # 加编号让每个请求都不同，测量未命中缓存时的性能
+        body = {**body, "question": f"{body['question']} #{i}"}
+    return body
+
+
+async def run_open_loop(url: str, bodies: List[dict], qps: float, total: int, duration: float,
+                        poisson: bool, unique: bool, max_inflight: int, timeout: float, seed: int) -> dict:
+    """开环压测：按计划时刻发送，不等待响应"""
+    rng = random.Random(seed)
+    result = LoadResult()
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        tasks = set()
+        start = time.perf_counter()
+        scheduled = start
+        i = 0
+        while (total and i < total) or (not total and scheduled - start < duration):
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_inflight:
+                # 未完成的请求过多，视为客户端侧失败，避免无限堆积
+                result.record(time.perf_counter() - scheduled, error="ClientOverload")
+            else:
+                task = asyncio.create_task(send(client, url, next_body(bodies, i, unique), scheduled, result))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            i += 1
+            scheduled += rng.expovariate(qps) if poisson else 1.0 / qps
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = time.perf_counter() - start
+    return result.summary(elapsed)
+
+
+async def run_closed_loop(url: str, bodies: List[dict], concurrency: int, total: int, duration: float,
+                          unique: bool, timeout: float) -> dict:
+    """闭环压测：固定数量的客户端循环发送"""
+    result = LoadResult()
+    counter = iter(range(total)) if total else None
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        sent = 0
+
+        async def worker():
+            nonlocal sent
+            while True:
+                if counter is not None:
+                    i = next(counter, None)
+                    if i is None:
+                        return
+                elif time.perf_counter() >= deadline:
+                    return
+                else:
+                    i = sent
+                sent += 1
+                await send(client, url, next_body(bodies, i, unique), time.perf_counter(), result)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return result.summary(elapsed)
+
+
+def print_summary(summary: dict, baseline: Optional[dict] = None):
+    latency = summary["latency_ms"]
+    print(f"\n=== 负载测试结果 ===")
+    print(f"请求数 {summary['requests']}，成功 {summary['ok']}，失败 {summary['errors']}"
+          f"（错误率 {summary['error_rate'] * 100:.2f}%），耗时 {summary['elapsed_seconds']}s")
+    if summary["error_types"]:
+        print(f"错误类型: {summary['error_types']}")
+
+    rows = [("吞吐(req/s)", summary["throughput_rps"], baseline and baseline["throughput_rps"])]
+    rows += [(f"{name}(ms)", latency[name], baseline and baseline["latency_ms"][name])
+             for name in ("p50", "p95", "p99", "mean", "max")]
+    rows.append(("错误率(%)", summary["error_rate"] * 100, baseline and baseline["error_rate"] * 100))
+    print(f"{'指标':12s} {'本次':>10s}" + (f" {'基线':>10s} {'变化':>8s}" if baseline else ""))
+    for name, value, base in rows:
+        line = f"{name:12s} {value:10.2f}"
+        if baseline:
+            change = f"{(value - base) / base * 100:+7.1f}%" if base else "      -"
+            line += f" {base:10.2f} {change}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/ask 负载测试")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="被测服务地址（使用 --serve 时忽略）")
+    parser.add_argument("--endpoint", default="/ask")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL问题语料")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--qps", type=float, help="开环模式的目标QPS")
+    mode.add_argument("--concurrency", type=int, default=16, help="闭环模式的并发数")
+    parser.add_argument("--poisson", action="store_true", help="开环模式下按泊松过程发送")
+    parser.add_argument("--requests", type=int, default=0, help="请求总数，0表示按 --duration 运行")
+    parser.add_argument("--duration", type=float, default=30, help="运行秒数")
+    parser.add_argument("--warmup", type=int, default=20, help="正式压测前的预热请求数（不计入结果）")
+    parser.add_argument("--unique", action="store_true", help="给每个问题加编号，避免命中缓存")
+    parser.add_argument("--shuffle", action="store_true", help="打乱语料顺序（由 --seed 决定，可复现）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-inflight", type=int, default=1000, help="开环模式下最多未完成的请求数")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--serve", metavar="MODULE:APP", help="启动模拟大模型和被测服务，如 src.fastapi_service:app")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="模拟大模型的生成延迟")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=30)
+    parser.add_argument("--ready-timeout", type=float, default=600, help="等待服务就绪的最长时间")
+    parser.add_argument("--output", help="结果JSON路径，默认 benchmark_results/load_<提交>_<时间>.json")
+    parser.add_argument("--compare", help="对比的基线结果JSON")
+    args = parser.parse_args()
+
+    bodies = load_corpus(args.corpus)
+    if args.shuffle:
+        random.Random(args.seed).shuffle(bodies)
+
+    processes = []
+    url = args.url
+    if args.serve:
+        url, processes = start_services(args.serve, args.llm_latency_ms, args.llm_tokens_per_second,
+                                        args.ready_timeout)
+    target = f"{url.rstrip('/')}{args.endpoint}"
+    try:
+        if args.warmup:
+            print(f"🔥 预热 {args.warmup} 个请求...")
+            asyncio.run(run_closed_loop(target, bodies, min(args.warmup, 4), args.warmup, 0, False, args.timeout))
+        if args.qps:
+            print(f"🚦 开环压测 {target}：{args.qps} QPS{'（泊松）' if args.poisson else ''}")
+            summary = asyncio.run(run_open_loop(target, bodies, args.qps, args.requests, args.duration,
+                                                args.poisson, args.unique, args.max_inflight,
+                                                args.timeout, args.seed))
+        else:
+            print(f"🚦 闭环压测 {target}：并发 {args.concurrency}")
+            summary = asyncio.run(run_closed_loop(target, bodies, args.concurrency, args.requests,
+                                                  args.duration, args.unique, args.timeout))
+    finally:
+        stop_services(processes)
+
+    revision = git_revision()
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            **revision,
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "target": args.serve or url,
+            "endpoint": args.endpoint,
+            "mode": "open" if args.qps else "closed",
+            "args": vars(args)
+        },
+        "summary": summary
+    }
+    output = args.output or os.path.join(
+        "benchmark_results", f"load_{revision['commit']}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+    print_summary(summary, baseline)
+    print(f"💾 结果已保存: {output}")
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+检索热路径微基准测试 - 单独测量最常调优的几个函数，结果与基线对比，退化超过阈值时以非零状态退出
+测试项（名称中的方括号为参数）：
+    load_documents[size_mb]     DocumentProcessor.load_documents 读取并切分大文件
+    get_embedding[chars]        VectorSearch.get_embedding 编码不同长度的文本
+    add_documents[docs]         VectorSearch.add_documents 向空索引写入不同规模的语料
+    search[top_k]               VectorSearch.search 在固定语料上以不同 top_k 检索
+
+每项先预热，再重复执行直到达到最少轮数和最短时间，统计 min / median / mean / stddev，
+对比基线时默认使用 median（--metric min 对偶发的调度抖动更不敏感）。
+基线应在同一台机器、同一配置下生成，不同机器之间的结果没有可比性。
+
+用法:
+    python benchmark_micro.py --save-baseline                  # 记录基线
+    python benchmark_micro.py --threshold 0.2                  # 与基线对比，median变慢超过20%则失败
+    python benchmark_micro.py -k search --rounds 50            # 只运行名称包含 search 的测试项
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import argparse
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import config
+from src.document_processor import DocumentProcessor
+from src.vector_search import VectorSearch
+from benchmark_embedding import SAMPLE_SENTENCES, make_documents
+from benchmark_load import git_revision
+
+DEFAULT_BASELINE = os.path.join("benchmark_results", "micro_baseline.json")
+QUERIES = ["退货需要几天时间", "怎么联系客服", "什么商品不能退货", "运费谁承担", "退款多久到账"]
+
+
+class Case:
+    def __init__(self, name: str, fn: Callable[[], object], setup: Optional[Callable[[], None]] = None):
+        """
+        一个测试项
+
+        Args:
+            fn: 被计时的函数
+            setup: 每轮计时前执行的准备工作（不计时），如清空索引
+        """
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+
+
+def measure(case: Case, warmup: int, min_rounds: int, min_time: float, max_rounds: int) -> Dict[str, float]:
+    """重复执行测试项，返回耗时统计（毫秒）"""
+    for _ in range(warmup):
+        if case.setup:
+            case.setup()
+        case.fn()
+
+    samples: List[float] = []
+    begin = time.perf_counter()
+    while len(samples) < max_rounds and (len(samples) < min_rounds or time.perf_counter() - begin < min_time):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        case.fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "rounds": len(samples),
+        "min": round(min(samples), 4),
+        "median": round(statistics.median(samples), 4),
+        "mean": round(statistics.fmean(samples), 4),
+        "stddev": round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0
+    }
+
+
+def quiet(fn: Callable[[], object]) -> Callable[[], object]:
+    """屏蔽被测函数的进度输出（print本身很快，但会刷屏）"""
+    def wrapper():
+        with redirect_stdout(io.StringIO()):
+            return fn()
+    return wrapper
+
+
+def write_corpus_file(path: str, size_mb: float, seed: int = 0):
+    """生成约 size_mb MB 的知识库文本（段落之间空行分隔）"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            paragraph = "".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(1, 12))) + "\n\n"
+            f.write(paragraph)
+            written += len(paragraph.encode("utf-8"))
+
+
+class Suite:
+    """构建全部测试项，模型和临时目录在首次用到时才创建"""
+
+    def __init__(self, workdir: str, model_path: str, index_backend: str):
+        self.workdir = workdir
+        self.model_path = model_path
+        self.index_backend = index_backend
+        self._searcher: Optional[VectorSearch] = None
+        self._index_counter = 0
+
+    @property
+    def searcher(self) -> VectorSearch:
+        """加载了模型的检索实例（不启用嵌入缓存和查询缓存，每次都实际计算）"""
+        if self._searcher is None:
+            with redirect_stdout(io.StringIO()):
+                self._searcher = VectorSearch(
+                    persist_directory=os.path.join(self.workdir, "search_index"),
+                    model_path=self.model_path,
+                    index_backend=self.index_backend
+                )
+        return self._searcher
+
+    def empty_index(self) -> VectorSearch:
+        """新建一个空索引，复用已加载的编码器，避免每轮重新加载模型"""
+        self._index_counter += 1
+        with redirect_stdout(io.StringIO()):
+            index = VectorSearch(
+                persist_directory=os.path.join(self.workdir, f"index_{self._index_counter}"),
+                model_path=self.model_path,
+                index_backend=self.index_backend,
+                load_model=False
+            )
+        index.encoder, index.tokenizer = self.searcher.encoder, self.searcher.tokenizer
+        return index
+
+    def cases(self, file_sizes_mb: List[float], text_lengths: List[int], corpus_sizes: List[int],
+              top_ks: List[int], search_corpus: int) -> List[Case]:
+        cases = []
+
+        processor = DocumentProcessor(chunk_size=config.CHUNK_SIZE)
+        for size_mb in file_sizes_mb:
+            path = os.path.join(self.workdir, f"corpus_{size_mb:g}mb.txt")
+            write_corpus_file(path, size_mb)
+            cases.append(Case(f"load_documents[{size_mb:g}mb]",
+                              quiet(lambda path=path: processor.load_documents(path))))
+
+        for chars in text_lengths:
+            text = ("".join(SAMPLE_SENTENCES) * (chars // len("".join(SAMPLE_SENTENCES)) + 1))[:chars]
+            cases.append(Case(f"get_embedding[{chars}chars]",
+                              lambda text=text: self.searcher.get_embedding(text)))
+
+        for docs in corpus_sizes:
+            documents = make_documents(docs, seed=docs)
+            state = {}
+
+            def setup(state=state):
+                state["index"] = self.empty_index()
+
+            cases.append(Case(f"add_documents[{docs}docs]",
+                              quiet(lambda documents=documents, state=state: state["index"].add_documents(documents)),
+                              setup=setup))
+
+        queries = iter(range(sys.maxsize))
+
+        def search_fixture():
+            # 检索语料只写入一次
+            if self.searcher.collection.count() == 0:
+                with redirect_stdout(io.StringIO()):
+                    self.searcher.add_documents(make_documents(search_corpus))
+
+        for top_k in top_ks:
+            cases.append(Case(
+                f"search[top_k={top_k}]",
+                quiet(lambda top_k=top_k: self.searcher.search(QUERIES[next(queries) % len(QUERIES)], top_k=top_k)),
+                setup=search_fixture
+            ))
+        return cases
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float,
+            metric: str = "median") -> List[str]:
+    """打印与基线的对比，返回退化超过阈值的测试项"""
+    regressions = []
+    print(f"\n{'测试项':28s} {metric + '(ms)':>12s} {'基线(ms)':>12s} {'变化':>9s}")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:28s} {stats[metric]:12.3f} {'-':>12s} {'新增':>9s}")
+            continue
+        change = (stats[metric] - base[metric]) / base[metric]
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = " ❌"
+        print(f"{name:28s} {stats[metric]:12.3f} {base[metric]:12.3f} {change * 100:+8.1f}%{flag}")
+    return regressions
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检索热路径微基准测试")
+    parser.add_argument("-k", dest="keyword", help="只运行名称包含该字符串的测试项")
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--index-backend", default=config.VECTOR_INDEX_BACKEND)
+    parser.add_argument("--file-sizes-mb", default="1,10", help="load_documents 的文件大小（MB）")
+    parser.add_argument("--text-lengths", default="16,128,512", help="get_embedding 的文本长度（字符）")
+    parser.add_argument("--corpus-sizes", default="100,1000", help="add_documents 的文档数")
+    parser.add_argument("--top-ks", default="1,5,20", help="search 的 top_k")
+    parser.add_argument("--search-corpus", type=int, default=1000, help="search 使用的语料文档数")
+    parser.add_argument("--warmup", type=int, default=2, help="每项的预热轮数")
+    parser.add_argument("--rounds", type=int, default=5, help="每项最少计时轮数")
+    parser.add_argument("--min-time", type=float, default=1.0, help="每项最短计时秒数")
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线结果JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--threshold", type=float, default=0.20, help="变慢超过该比例视为退化")
+    parser.add_argument("--metric", choices=["median", "min", "mean"], default="median", help="与基线对比的统计量")
+    parser.add_argument("--output", help="本次结果JSON路径")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="micro_bench_")
+    try:
+        suite = Suite(workdir, args.model, args.index_backend)
+        cases = suite.cases(parse_list(args.file_sizes_mb, float), parse_list(args.text_lengths, int),
+                            parse_list(args.corpus_sizes, int), parse_list(args.top_ks, int), args.search_corpus)
+        if args.keyword:
+            cases = [case for case in cases if args.keyword in case.name]
+
+        results = {}
+        for case in cases:
+            print(f"⏱️  {case.name} ...", flush=True)
+            results[case.name] = measure(case, args.warmup, args.rounds, args.min_time, args.max_rounds)
+            stats = results[case.name]
+            print(f"   median {stats['median']:.3f}ms  min {stats['min']:.3f}ms  "
+                  f"stddev {stats['stddev']:.3f}ms（{stats['rounds']} 轮）")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            **git_revision(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "model": args.model,
+            "index_backend": args.index_backend
+        },
+        "results": results
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        # 只更新本次运行过的测试项，保留基线中其余测试项
+        baseline_report = report
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline_report = json.load(f)
+            baseline_report["meta"] = report["meta"]
+            baseline_report["results"].update(results)
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_report, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存: {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️  基线文件不存在: {args.baseline}，先运行 --save-baseline")
+        sys.exit(0)
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold, args.metric)
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项退化超过 {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n✅ 没有超过 {args.threshold * 100:.0f}% 的退化")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试 - 分解冷启动各阶段耗时
+阶段：
+    import       导入 chromadb / torch / transformers（或 onnxruntime）
+    index_open   打开已持久化的索引
+    model_load   加载嵌入模型
+    warm_up      执行合成预热查询
+
+每轮在新的Python进程中测量，保证导入是冷的；多轮取中位数。
+加 --serve 时另外启动真实服务，测量从进程启动到 /livez、/readyz 返回200的时间。
+
+用法:
+    python benchmark_startup.py --rounds 3
+    python benchmark_startup.py --serve --mode fast
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import numpy as np
+
+from config import config
+
+# 在子进程中执行：依次测量各阶段耗时并以JSON输出
+CHILD = r"""
+import json, sys, time
+timings = {}
+backend = sys.argv[1]
+
+start = time.perf_counter()
+import numpy
+if sys.argv[3] == "chroma":
+    import chromadb
+if backend == "torch":
+    import torch
+else:
+    import onnxruntime
+import transformers
+timings["import"] = time.perf_counter() - start
+
+from src.vector_search import VectorSearch
+search = VectorSearch(persist_directory=sys.argv[2], model_path=sys.argv[4],
+                      index_backend=sys.argv[3], read_only=True)
+search.warm_up(["退货政策是什么", "物流需要几天", "怎么联系客服"])
+timings.update(search.timings)
+timings["chunks"] = search.collection.count()
+print("@@" + json.dumps(timings))
+"""
+
+
+def measure_stages(args) -> dict:
+    """每轮启动一个新进程测量各阶段耗时"""
+    from src.encoders import parse_model_spec
+    backend, _ = parse_model_spec(args.model)
+
+    rounds = []
+    for i in range(args.rounds):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, backend, args.persist_directory, args.index_backend, args.model],
+            capture_output=True, text=True, check=True
+        ).stdout
+        line = next(line for line in output.splitlines() if line.startswith("@@"))
+        rounds.append(json.loads(line[2:]))
+        print(f"  第 {i + 1} 轮: {rounds[-1]}")
+    return rounds
+
+
+def wait_for(url: str, deadline: float):
+    """轮询直到返回200，返回耗时；超时返回None"""
+    import requests
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return time.monotonic()
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_serve(args) -> dict:
+    """启动真实服务，测量 /livez 和 /readyz 可用的时间"""
+    env = {**os.environ, "STARTUP_MODE": args.mode}
+    start = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api_service:app", "--port", str(args.port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base = f"http://127.0.0.1:{args.port}"
+        deadline = start + args.timeout
+        live = wait_for(f"{base}/livez", deadline)
+        ready = wait_for(f"{base}/readyz", deadline)
+        import requests
+        detail = requests.get(f"{base}/readyz", timeout=1).json() if ready else None
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "livez_seconds": round(live - start, 3) if live else None,
+        "readyz_seconds": round(ready - start, 3) if ready else None,
+        "server_timings": detail.get("timings") if detail else None
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--persist-directory", default=config.VECTOR_DB_PATH)
+    parser.add_argument("--index-backend", default=config.VECTOR_INDEX_BACKEND, choices=["chroma", "numpy"])
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--serve", action="store_true", help="同时测量真实服务的存活/就绪时间")
+    parser.add_argument("--mode", default="fast", choices=["fast", "sync"], help="--serve 时的启动模式")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print("⏱️  分阶段测量（每轮新进程）...")
+    rounds = measure_stages(args)
+    stages = ["import", "index_open", "model_load", "warm_up"]
+    print(f"\n=== 冷启动各阶段耗时（{args.rounds} 轮中位数，{rounds[0]['chunks']} 个文本块）===")
+    for stage in stages:
+        print(f"{stage:12s} {np.median([r[stage] for r in rounds]):8.3f}s")
+    print(f"{'total':12s} {np.median([sum(r[s] for s in stages) for r in rounds]):8.3f}s")
+
+    if args.serve:
+        print(f"\n⏱️  启动服务测量（{args.mode} 模式）...")
+        result = measure_serve(args)
+        print(f"/livez 可用: {result['livez_seconds']}s")
+        print(f"/readyz 就绪: {result['readyz_seconds']}s")
+        print(f"服务端各阶段耗时: {result['server_timings']}")
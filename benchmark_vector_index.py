@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+向量索引后端基准测试 - ChromaDB 对比 纯NumPy索引
+在1k / 10k / 100k个随机向量上分别测量建索引时间、查询延迟和持久化后重新打开的时间。
+
+用法:
+    python benchmark_vector_index.py --sizes 1000,10000,100000 --dim 512 --queries 200
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.vector_index import VectorIndex
+
+WRITE_BATCH_SIZE = 5000
+
+
+def make_data(size: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((size, dim), dtype=np.float32)
+    ids = [f"doc_{i}" for i in range(size)]
+    documents = [f"文档内容 {i}" for i in range(size)]
+    return ids, embeddings, documents
+
+
+def time_queries(collection, queries, top_k):
+    """逐条查询，返回每次查询的耗时（毫秒）"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def bench_chroma(ids, embeddings, documents, queries, top_k):
+    import chromadb
+
+    path = tempfile.mkdtemp(prefix="bench_chroma_")
+    try:
+        client = chromadb.PersistentClient(path=path)
+        collection = client.get_or_create_collection(name="bench")
+        start = time.perf_counter()
+        for i in range(0, len(ids), WRITE_BATCH_SIZE):
+            collection.add(
+                ids=ids[i:i + WRITE_BATCH_SIZE],
+                embeddings=embeddings[i:i + WRITE_BATCH_SIZE].tolist(),
+                documents=documents[i:i + WRITE_BATCH_SIZE]
+            )
+        build = time.perf_counter() - start
+        latencies = time_queries(collection, queries, top_k)
+
+        start = time.perf_counter()
+        reopened = chromadb.PersistentClient(path=path).get_collection(name="bench")
+        reopened.query(query_embeddings=[queries[0].tolist()], n_results=top_k)
+        reopen = time.perf_counter() - start
+        return build, latencies, reopen
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def bench_numpy(ids, embeddings, documents, queries, top_k):
+    path = tempfile.mkdtemp(prefix="bench_numpy_")
+    try:
+        index = VectorIndex(path)
+        start = time.perf_counter()
+        for i in range(0, len(ids), WRITE_BATCH_SIZE):
+            index.add(ids[i:i + WRITE_BATCH_SIZE], embeddings[i:i + WRITE_BATCH_SIZE], documents[i:i + WRITE_BATCH_SIZE])
+        index.persist()
+        build = time.perf_counter() - start
+        latencies = time_queries(index, queries, top_k)
+
+        start = time.perf_counter()
+        reopened = VectorIndex(path, mmap=True)
+        reopened.query(query_embeddings=[queries[0].tolist()], n_results=top_k)
+        reopen = time.perf_counter() - start
+        return build, latencies, reopen
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量索引后端基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--backends", default="chroma,numpy")
+    args = parser.parse_args()
+
+    benches = {"chroma": bench_chroma, "numpy": bench_numpy}
+    print("=== 向量索引后端基准测试 ===")
+    print(f"{'后端':8s} {'规模':>8s} {'建索引(s)':>10s} {'查询p50(ms)':>12s} {'查询p99(ms)':>12s} {'重新打开(s)':>12s}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        ids, embeddings, documents = make_data(size, args.dim)
+        queries = np.random.default_rng(1).standard_normal((args.queries, args.dim), dtype=np.float32)
+        for backend in args.backends.split(","):
+            build, latencies, reopen = benches[backend](ids, embeddings, documents, queries, args.top_k)
+            print(f"{backend:8s} {size:8d} {build:10.2f} {np.percentile(latencies, 50):12.3f} "
+                  f"{np.percentile(latencies, 99):12.3f} {reopen:12.3f}")
@@ -12,9 +12,62 @@ class Config:
     API_PORT: int = int(os.getenv("API_PORT", 8000))
     
     # 向量搜索配置
-    VECTOR_DB_PATH: str = os.getenv("VECTOR_DB_PATH", "./data/vectors")
-    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    KNOWLEDGE_PATH: str = os.getenv("KNOWLEDGE_PATH", "data/return_policy.txt")  # 知识库文件或目录
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", 300))  # 每块的token上限（需小于模型最大长度512）
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", 0))  # 相邻块重叠的token数（按整句）
+    VECTOR_DB_PATH: str = os.getenv("VECTOR_DB_PATH", "./chroma_db")
+    VECTOR_INDEX_BACKEND: str = os.getenv("VECTOR_INDEX_BACKEND", "chroma")  # chroma / numpy
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "dense")  # dense / hybrid（BM25 + 向量，RRF融合）
+    KEYWORD_TOKENIZER: str = os.getenv("KEYWORD_TOKENIZER", "ngram")  # ngram / jieba
+    # 嵌入模型，格式为 "[后端:]模型路径"，后端可选 torch（默认）/ onnx / onnx-int8
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "/app/models/bge-small-zh")
     TOP_K_RESULTS: int = int(os.getenv("TOP_K_RESULTS", 3))
+    MAX_TOP_K: int = int(os.getenv("MAX_TOP_K", 50))  # 批量接口单个问题最多返回的文档数
+    MAX_BATCH_QUESTIONS: int = int(os.getenv("MAX_BATCH_QUESTIONS", 256))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")  # 置空则关闭缓存
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", 100000))
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", 3600))
+    SEMANTIC_CACHE_MAX_DISTANCE: float = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", 0.05))
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", 1000))  # 小于等于0则关闭语义缓存
+    SEMANTIC_CACHE_TTL: float = float(os.getenv("SEMANTIC_CACHE_TTL", 600))
+    
+    # 推理执行配置
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", 4))
+    INFERENCE_QUEUE_SIZE: int = int(os.getenv("INFERENCE_QUEUE_SIZE", 64))
+    # 查询嵌入微批：等待时间为0时不合并；能合并的并发数受 INFERENCE_WORKERS 限制
+    QUERY_BATCH_MAX_SIZE: int = int(os.getenv("QUERY_BATCH_MAX_SIZE", 16))
+    QUERY_BATCH_MAX_WAIT_MS: float = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", 2))
+    PREFORK_WORKERS: int = int(os.getenv("PREFORK_WORKERS", 4))  # python -m src.prefork 的worker数
+    
+    # 大模型调用配置（src/llm_client.py，各AI代理服务共用）
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", 100))  # 每个主机的最大连接数
+    LLM_MAX_KEEPALIVE: int = int(os.getenv("LLM_MAX_KEEPALIVE", 20))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", 60))
+    LLM_RETRIES: int = int(os.getenv("LLM_RETRIES", 2))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"  # 需要安装 h2
+    # 流式问答（src/api_service.py 的 /api/chat/stream）使用的OpenAI兼容接口；未配置密钥时直接返回检索摘要
+    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"))
+    LLM_API_KEY: str = os.getenv("LLM_API_KEY", os.getenv("DEEPSEEK_API_KEY", ""))
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "deepseek-chat")
+    LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", 1000))
+    
+    # 启动配置：sync 启动时把知识库同步到索引；fast 只读打开已持久化的索引，不重新切分和生成嵌入
+    STARTUP_MODE: str = os.getenv("STARTUP_MODE", "sync")
+    WARMUP_QUERIES: int = int(os.getenv("WARMUP_QUERIES", 3))  # 就绪前执行的合成预热查询数，0表示不预热
+    
+    # 管理接口配置：为空时管理接口（如 /admin/reload、/admin/profile）不可用
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", 60))  # 单次采样分析的最长时间
+    # 持续采样分析：低频常驻采样，保留最近一段时间的调用栈
+    PROFILER_CONTINUOUS: bool = os.getenv("PROFILER_CONTINUOUS", "false").lower() == "true"
+    PROFILER_HZ: float = float(os.getenv("PROFILER_HZ", 5))
+    PROFILER_WINDOW_SECONDS: float = float(os.getenv("PROFILER_WINDOW_SECONDS", 600))
+    
+    # 监控配置：系统资源由后台任务定期采样，/health 和 /metrics 只读取最近一次的快照
+    SYSTEM_SAMPLE_INTERVAL: float = float(os.getenv("SYSTEM_SAMPLE_INTERVAL", 5))  # 采样间隔（秒）
     
     # 对话配置
     MAX_CONVERSATION_HISTORY: int = 10
@@ -23,6 +76,11 @@ class Config:
     # 模型路径（本地模型）
     LOCAL_MODEL_PATH: str = os.getenv("LOCAL_MODEL_PATH", "./models")
     
+    @property
+    def query_batch_wait_ms(self) -> float:
+        """实际使用的微批等待时间：并发查询来自推理线程池，只有一个推理线程时不会有第二个查询加入批次，不等待"""
+        return self.QUERY_BATCH_MAX_WAIT_MS if self.INFERENCE_WORKERS > 1 else 0
+    
     @classmethod
     def from_env(cls):
         """从环境变量加载配置"""
@@ -1,64 +1,39 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
 import json
 import sys
 from flask import Flask, request, jsonify
-import requests
-import urllib3
 
-# 禁用SSL警告
-urllib3.disable_warnings()
+from src.llm_client import SyncLLMClient, LLMError
 
 app = Flask(__name__)
 
 # 配置你的DeepSeek API密钥
 # 注册地址：https://platform.deepseek.com/
-API_KEY = "sk-你的DeepSeek密钥"
+API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-你的DeepSeek密钥")
+BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+
+# 共享的连接池客户端（httpx按UTF-8编码JSON请求体）
+llm = SyncLLMClient()
 
 def get_ai_response(question):
     """获取AI回答（修复编码问题）"""
     try:
-        url = "https://api.deepseek.com/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json; charset=utf-8"  # 明确指定UTF-8
-        }
-        
-        # 确保数据是UTF-8编码
-        data = {
-            "model": "deepseek-chat",
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "你是专业的智能客服助手，用中文回答，保持友好、专业、有帮助。"
-                },
-                {
-                    "role": "user", 
-                    "content": question
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 2000,
-            "stream": False
-        }
-        
-        # 使用json.dumps确保编码正确
-        json_data = json.dumps(data, ensure_ascii=False)
-        
-        response = requests.post(
-            url, 
-            headers=headers, 
-            data=json_data.encode('utf-8'),  # 显式编码为UTF-8字节
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            return f"API调用失败: {response.status_code} - {response.text}"
-            
+        messages = [
+            {
+                "role": "system", 
+                "content": "你是专业的智能客服助手，用中文回答，保持友好、专业、有帮助。"
+            },
+            {
+                "role": "user", 
+                "content": question
+            }
+        ]
+        return llm.chat(BASE_URL, API_KEY, "deepseek-chat", messages,
+                        temperature=0.7, max_tokens=2000, timeout=30)
+    except LLMError as e:
+        return str(e)
     except Exception as e:
         return f"请求失败: {str(e)}"
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+多worker内存测量 - 对比 prefork 与 uvicorn --workers 的每worker内存
+启动服务，等所有worker就绪后发送一批问答请求（让推理路径上的页面都被实际访问），
+再从 /proc/<pid>/smaps_rollup 读取主进程和每个worker的内存：
+    RSS            常驻内存，共享页面在每个进程中都会被完整计入
+    PSS            共享页面按共享进程数均摊后的内存，所有进程相加即为实际占用
+    Shared         与其他进程共享的页面
+    Private        进程私有的页面（写时复制后被改写的页面也计入这里）
+
+用法:
+    python measure_worker_memory.py --mode prefork --workers 4
+    python measure_worker_memory.py --mode uvicorn --workers 4
+"""
+
+import sys
+import time
+import argparse
+import subprocess
+
+import httpx
+import psutil
+
+QUESTIONS = ["退货需要几天时间", "怎么联系客服", "什么商品不能退货", "运费谁承担", "退款多久到账"]
+
+
+def read_smaps(pid: int) -> dict:
+    """读取进程内存汇总（单位MB）"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def child_role(process: psutil.Process) -> str:
+    """uvicorn --workers 以spawn方式启动worker，同时会拉起multiprocessing的resource_tracker，它不处理请求，不计入worker"""
+    if "resource_tracker" in " ".join(process.cmdline()):
+        return "helper"
+    return "worker"
+
+
+def start_server(mode: str, workers: int, port: int) -> subprocess.Popen:
+    if mode == "prefork":
+        command = [sys.executable, "-m", "src.prefork", "--workers", str(workers), "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "src.api_service:app",
+                   "--workers", str(workers), "--port", str(port)]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url: str, workers: int, timeout: float):
+    """连续多次 /readyz 返回200才认为全部worker就绪（请求会被分发到不同worker）"""
+    deadline = time.monotonic() + timeout
+    consecutive = 0
+    while time.monotonic() < deadline:
+        try:
+            ok = httpx.get(f"{url}/readyz", timeout=2).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        consecutive = consecutive + 1 if ok else 0
+        if consecutive >= workers * 4:
+            return
+        time.sleep(0.1 if ok else 0.5)
+    raise TimeoutError("等待服务就绪超时")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多worker内存测量")
+    parser.add_argument("--mode", choices=["prefork", "uvicorn"], default="prefork")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--requests", type=int, default=200, help="测量前发送的问答请求数")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args.mode, args.workers, args.port)
+    try:
+        wait_until_ready(url, args.workers, args.timeout)
+        with httpx.Client(timeout=30) as client:
+            for i in range(args.requests):
+                client.post(f"{url}/ask", json={"question": f"{QUESTIONS[i % len(QUESTIONS)]} #{i}"})
+
+        master = psutil.Process(server.pid)
+        processes = [("master", master.pid)] + [
+            (child_role(child), child.pid) for child in master.children(recursive=True)
+        ]
+        rows = [(name, pid, read_smaps(pid)) for name, pid in processes]
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\n=== 内存占用（{args.mode}，{args.workers} 个worker，MB）===")
+    print(f"{'进程':8s} {'pid':>8s} {'RSS':>9s} {'PSS':>9s} {'Shared':>9s} {'Private':>9s}")
+    for name, pid, memory in rows:
+        print(f"{name:8s} {pid:8d} {memory['rss']:9.1f} {memory['pss']:9.1f} "
+              f"{memory['shared']:9.1f} {memory['private']:9.1f}")
+    workers = [memory for name, _, memory in rows if name == "worker"]
+    total_pss = sum(memory["pss"] for _, _, memory in rows)
+    print(f"PSS合计 {total_pss:.1f} MB；每worker平均 PSS {sum(m['pss'] for m in workers) / max(len(workers), 1):.1f} MB，"
+          f"Private {sum(m['private'] for m in workers) / max(len(workers), 1):.1f} MB")
@@ -1,46 +1,39 @@
 #!/usr/bin/env python3
+import os
 import flask
-from flask import Flask, request, jsonify
-import requests
+from flask import Flask, request, jsonify, Response, stream_with_context
 import traceback
 import sys
+import time
+
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from src.llm_client import SyncLLMClient, LLMError, format_sse, LLM_FIRST_TOKEN_SECONDS, LLM_STREAM_SECONDS
 
 app = Flask(__name__)
 
 # 配置
-API_KEY = "sk-你的DeepSeek密钥"  # 请替换为你的实际密钥
+API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-你的DeepSeek密钥")  # 请替换为你的实际密钥
+BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+
+# 共享的连接池客户端，Flask的多个请求线程复用同一组长连接
+llm = SyncLLMClient()
+
+def build_messages(question):
+    return [
+        {"role": "system", "content": "你是一个智能客服助手，回答要友好、专业、有帮助。"},
+        {"role": "user", "content": question}
+    ]
 
 def get_ai_response(question):
     """获取AI回复"""
     try:
         # 使用DeepSeek API
-        headers = {
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": "你是一个智能客服助手，回答要友好、专业、有帮助。"},
-                {"role": "user", "content": question}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-        
-        response = requests.post(
-            "https://api.deepseek.com/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            return f"API调用失败: {response.status_code} - {response.text}"
-            
+        messages = build_messages(question)
+        return llm.chat(BASE_URL, API_KEY, "deepseek-chat", messages,
+                        temperature=0.7, max_tokens=1000, timeout=30)
+    except LLMError as e:
+        return str(e)
     except Exception as e:
         return f"请求失败: {str(e)}"
 
@@ -85,6 +78,49 @@ def chat():
             "status": "error"
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST', 'OPTIONS'])
+def chat_stream():
+    """流式聊天：以SSE逐段返回AI回复"""
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    
+    data = request.json or {}
+    question = data.get('question', '').strip()
+    if not question:
+        return jsonify({"answer": "问题内容不能为空", "status": "error"}), 400
+    
+    print(f"流式处理问题: {question[:50]}...", file=sys.stderr)
+    
+    def events():
+        start = time.perf_counter()
+        first_token = None
+        try:
+            for chunk in llm.stream_chat(BASE_URL, API_KEY, "deepseek-chat", build_messages(question),
+                                         temperature=0.7, max_tokens=1000, timeout=30):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    LLM_FIRST_TOKEN_SECONDS.labels(model="deepseek-chat").observe(first_token)
+                yield format_sse({"token": chunk})
+            total = time.perf_counter() - start
+            LLM_STREAM_SECONDS.labels(model="deepseek-chat").observe(total)
+            yield format_sse({
+                "done": True,
+                "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                "total_ms": round(total * 1000, 1)
+            })
+        except Exception as e:
+            print(f"流式请求失败: {e}", file=sys.stderr)
+            yield format_sse({"error": f"请求失败: {str(e)}"}, event="error")
+    
+    # X-Accel-Buffering 关闭Nginx缓冲，token到达即转发
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus指标（含流式接口的首token时间）"""
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
 if __name__ == '__main__':
     print("启动AI代理服务在 0.0.0.0:8001", file=sys.stderr)
     app.run(host='0.0.0.0', port=8001, debug=False, threaded=True)
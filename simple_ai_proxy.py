@@ -4,13 +4,18 @@
 直接运行，无需虚拟环境
 """
 
+import os
 from flask import Flask, request, jsonify
-import requests
 import json
 import sys
 
+from src.llm_client import SyncLLMClient, LLMError
+
 app = Flask(__name__)
 
+# 共享的连接池客户端：长连接复用，避免每次请求重新握手
+llm = SyncLLMClient()
+
 @app.route('/health')
 def health():
     return jsonify({"status": "ok", "service": "simple-ai-proxy"})
@@ -27,36 +32,29 @@ def chat():
         # 方案1: 使用DeepSeek API（推荐）
         # 到 https://platform.deepseek.com/ 注册获取免费API密钥
         
-        api_key = "sk-你的DeepSeek密钥"  # 替换为你的实际密钥
+        api_key = os.getenv("DEEPSEEK_API_KEY", "sk-你的DeepSeek密钥")  # 替换为你的实际密钥
         
-        response = requests.post(
-            "https://api.deepseek.com/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "deepseek-chat",
-                "messages": [
+        try:
+            answer = llm.chat(
+                os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+                api_key,
+                "deepseek-chat",
+                [
                     {"role": "system", "content": "你是智能客服助手"},
                     {"role": "user", "content": question}
                 ],
-                "temperature": 0.7
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            answer = response.json()["choices"][0]["message"]["content"]
-        else:
-            answer = f"API调用失败: {response.status_code}"
+                temperature=0.7,
+                max_tokens=None,  # 与原先的请求一致，不限制回答长度
+                timeout=30
+            )
+        except LLMError as e:
+            answer = f"API调用失败: {e.status_code}" if e.status_code else str(e)
             
         # 方案2: 如果你找到了本地模型，可以这样调用
-        # response = requests.post(
+        # answer = llm.post_json(
         #     "http://localhost:8000/v1/chat/completions",
-        #     json={"messages": [{"role": "user", "content": question}]}
-        # )
-        # answer = response.json()["choices"][0]["message"]["content"]
+        #     {"messages": [{"role": "user", "content": question}]}
+        # )["choices"][0]["message"]["content"]
         
         # 方案3: 临时模拟回复（仅用于测试）
         # answer = f"我是智能客服，收到你的问题：{question}"
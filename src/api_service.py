@@ -3,22 +3,31 @@
 """
 import os
 import sys
+import hmac
+import time
+import asyncio
 from pathlib import Path
 
 # 禁用ChromaDB遥测（减少日志噪音）
 os.environ['ANONYMIZED_TELEMETRY'] = 'False'
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
 import logging
 from datetime import datetime
 
 # 导入本地模块
+from config import config
 from .document_processor import DocumentProcessor
-from .vector_search import VectorSearch
+from .vector_search import VectorSearch, IndexSharedError
+from .query_cache import QueryEmbeddingCache
+from .semantic_cache import SemanticCache
+from .inference_executor import BoundedExecutor, ExecutorBusyError
+from .llm_client import create_client, format_sse, LLMError, LLM_FIRST_TOKEN_SECONDS, LLM_STREAM_SECONDS
+from . import profiler
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -43,55 +52,165 @@ class QuestionResponse(BaseModel):
     sources: Optional[List] = None
     timestamp: str
 
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    top_k: int = Field(3, ge=1, le=config.MAX_TOP_K)
+
+class BatchQuestionResponse(BaseModel):
+    status: str
+    results: List[QuestionResponse]
+
 # 全局变量
 vector_search = None
 processor = None
+semantic_cache = SemanticCache(
+    max_distance=config.SEMANTIC_CACHE_MAX_DISTANCE,
+    maxsize=config.SEMANTIC_CACHE_SIZE,
+    ttl=config.SEMANTIC_CACHE_TTL
+)
+# 模型推理和向量检索在独立线程池中执行，避免阻塞事件循环
+inference_executor = BoundedExecutor(
+    max_workers=config.INFERENCE_WORKERS,
+    max_queue=config.INFERENCE_QUEUE_SIZE
+)
 
-@app.on_event("startup")
-async def startup_event():
-    """启动事件：初始化系统"""
+# 流式问答的大模型客户端（连接池复用，见 src/llm_client.py）
+llm_client = create_client()
+
+# 持续采样分析器（PROFILER_CONTINUOUS=true 时随服务启动，也可通过管理接口开关；PROFILER_HZ<=0 表示禁用）
+continuous_profiler = profiler.ContinuousProfiler(
+    hz=config.PROFILER_HZ,
+    window_seconds=config.PROFILER_WINDOW_SECONDS
+) if config.PROFILER_HZ > 0 else None
+
+# 启动状态：模型和索引在后台加载，/livez 立即可用，加载和预热完成后 /readyz 才返回就绪
+startup_state = {"phase": "starting", "mode": config.STARTUP_MODE, "timings": {}}
+
+# 预热用的合成查询
+WARMUP_QUERIES = ["退货政策是什么", "物流需要几天", "怎么联系客服", "运费谁承担", "什么商品不能退货"]
+
+# prefork 模式下由主进程在fork之前加载好的向量搜索实例
+preloaded_search = None
+
+def preload_system(num_threads: int = 0):
+    """
+    prefork 模式：在fork之前加载模型并以内存映射只读打开NumPy索引，
+    worker以写时复制方式共享模型权重和索引的内存页。
+    这里不做推理（推理会创建线程池，而线程不会被fork继承），预热和微批线程在每个worker中启动
+    """
+    global preloaded_search
+    startup_state["mode"] = "prefork"
+    preloaded_search = VectorSearch(
+        persist_directory=config.VECTOR_DB_PATH,
+        model_path=config.EMBEDDING_MODEL,
+        batch_size=config.EMBEDDING_BATCH_SIZE,
+        # 磁盘嵌入缓存不支持多个进程同时写入
+        cache_dir=None,
+        query_cache=QueryEmbeddingCache(maxsize=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL),
+        index_backend="numpy",
+        retrieval_mode=config.RETRIEVAL_MODE,
+        keyword_tokenizer=config.KEYWORD_TOKENIZER,
+        read_only=True,
+        num_threads=num_threads
+    )
+    return preloaded_search
+
+def initialize_system():
+    """加载模型、打开索引（sync 模式下同步知识库）并预热（阻塞调用，在后台线程中执行）"""
     global vector_search, processor
     
+    begin = time.perf_counter()
     try:
-        logger.info("🚀 正在启动智能客服系统...")
-        
-        # 初始化文档处理器
-        processor = DocumentProcessor()
-        logger.info("📖 正在加载文档...")
-        
-        # 加载文档（确保 data/return_policy.txt 存在）
-        data_file = "data/return_policy.txt"
-        if os.path.exists(data_file):
-            documents = processor.load_documents(data_file)
-            logger.info(f"✅ 成功加载 {len(documents)} 个文档")
-        else:
-            logger.warning(f"⚠️  数据文件不存在: {data_file}")
+        # 知识库可以是单个文件或目录（确保 data/return_policy.txt 存在）
+        data_path = config.KNOWLEDGE_PATH
+        if not os.path.exists(data_path):
+            logger.warning(f"⚠️  数据文件不存在: {data_path}")
             # 创建示例数据
-            with open(data_file, 'w') as f:
+            os.makedirs(os.path.dirname(data_path) or ".", exist_ok=True)
+            with open(data_path, 'w') as f:
                 f.write("退货政策：30天内无理由退货\n物流时间：3-5个工作日\n客服电话：400-123-4567")
-            documents = processor.load_documents(data_file)
         
-        # 初始化向量搜索
-        logger.info("🔄 初始化向量搜索系统...")
-        vector_search = VectorSearch()
-        # vector_search.initialize()  # 已移除，因为在 __init__ 中初始化
+        # 初始化向量搜索（prefork 模式下已在fork前加载，这里只启动本进程的微批线程）
+        startup_state["phase"] = "loading"
+        if preloaded_search is not None:
+            search = preloaded_search
+            if config.query_batch_wait_ms > 0:
+                search.start_query_batcher(config.QUERY_BATCH_MAX_SIZE, config.query_batch_wait_ms)
+        else:
+            logger.info("🔄 初始化向量搜索系统...")
+            search = VectorSearch(
+                persist_directory=config.VECTOR_DB_PATH,
+                model_path=config.EMBEDDING_MODEL,
+                batch_size=config.EMBEDDING_BATCH_SIZE,
+                cache_dir=config.EMBEDDING_CACHE_DIR,
+                cache_size=config.EMBEDDING_CACHE_SIZE,
+                query_cache=QueryEmbeddingCache(maxsize=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL),
+                query_batch_size=config.QUERY_BATCH_MAX_SIZE,
+                query_batch_wait_ms=config.query_batch_wait_ms,
+                index_backend=config.VECTOR_INDEX_BACKEND,
+                retrieval_mode=config.RETRIEVAL_MODE,
+                keyword_tokenizer=config.KEYWORD_TOKENIZER,
+                read_only=config.STARTUP_MODE == "fast"
+            )
         
-        # 处理文档并添加到向量数据库
-        if documents:
-            logger.info(f"📝 正在处理 {len(documents)} 个文档...")
-            vector_search.add_documents(documents)
-            logger.info(f"🎉 成功将文档添加到向量数据库")
+        # 初始化文档处理器：用嵌入模型tokenizer的独立副本按真实token数切块（后台重载与查询编码可并发）
+        doc_processor = DocumentProcessor(
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP,
+            tokenizer=search.chunking_tokenizer()
+        )
         
-        logger.info("✅ 智能客服系统启动完成！")
+        if search.read_only:
+            # fast / prefork 模式直接使用已持久化的索引；知识库更新通过 python -m src.ingest 或 /admin/reload 完成
+            logger.info(f"⚡ 快速启动：只读打开索引 {search.collection_name}（{search.collection.count()} 个文本块）")
+            if search.collection.count() == 0:
+                logger.warning("⚠️  索引为空，请先运行 python -m src.ingest 或调用 /admin/reload")
+        else:
+            # 流式读取文档并增量同步到向量数据库（语料未变化时不会重新生成嵌入）
+            startup_state["phase"] = "syncing"
+            logger.info(f"📖 正在同步文档: {data_path}")
+            sync_start = time.perf_counter()
+            search.add_documents_stream(doc_processor.iter_chunks(data_path))
+            search.timings["sync"] = time.perf_counter() - sync_start
+            logger.info(f"🎉 向量数据库已与文档同步")
+        
+        if config.WARMUP_QUERIES > 0:
+            startup_state["phase"] = "warming_up"
+            search.warm_up(WARMUP_QUERIES[:config.WARMUP_QUERIES])
+        
+        # 全部准备好之后才对外可见，之前的请求返回503
+        vector_search, processor = search, doc_processor
+        startup_state["timings"] = {
+            **{stage: round(seconds, 3) for stage, seconds in search.timings.items()},
+            "total": round(time.perf_counter() - begin, 3)
+        }
+        startup_state["phase"] = "ready"
+        logger.info(f"✅ 智能客服系统启动完成！各阶段耗时: {startup_state['timings']}")
         
     except Exception as e:
+        startup_state["phase"] = "failed"
+        startup_state["error"] = str(e)
         logger.error(f"❌ 系统启动失败: {e}")
-        raise
+
+@app.on_event("startup")
+async def startup_event():
+    """启动事件：在后台线程中初始化系统，服务立即开始接受请求"""
+    logger.info(f"🚀 正在启动智能客服系统（{config.STARTUP_MODE} 模式）...")
+    asyncio.get_running_loop().run_in_executor(None, initialize_system)
+    # prefork 模式下每个worker各自启动采样线程（线程不会被fork继承）
+    if config.PROFILER_CONTINUOUS and continuous_profiler is not None:
+        continuous_profiler.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """关闭事件：清理资源"""
     logger.info("🛑 正在关闭智能客服系统...")
+    inference_executor.shutdown()
+    if continuous_profiler is not None:
+        continuous_profiler.stop()
+    await llm_client.aclose()
+    if vector_search is not None and vector_search.embedding_cache is not None:
+        vector_search.embedding_cache.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def chat_interface():
@@ -153,17 +272,102 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/livez")
+async def liveness():
+    """存活探针：进程和事件循环正常即返回200；初始化失败时返回503，让编排系统重启实例"""
+    if startup_state["phase"] == "failed":
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup_state.get("error")})
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """就绪探针：模型加载、索引打开和预热全部完成后返回200"""
+    if startup_state["phase"] != "ready":
+        return JSONResponse(status_code=503, content={"status": startup_state["phase"]})
+    return {"status": "ready", "mode": startup_state["mode"], "timings": startup_state["timings"]}
+
 @app.get("/system-info")
 async def system_info():
     """系统信息"""
+    embedding_cache = None
+    query_cache = None
+    if vector_search is not None:
+        if vector_search.embedding_cache is not None:
+            embedding_cache = vector_search.embedding_cache.stats()
+        if vector_search.query_cache is not None:
+            query_cache = vector_search.query_cache.stats()
+    
     return {
         "name": "智能客服系统",
         "status": "running",
         "features": ["问答系统", "向量搜索", "Web界面"],
-        "endpoints": ["/", "/chat", "/ask", "/health", "/docs", "/redoc"],
-        "ai_capabilities": ["文档理解", "语义搜索"]
+        "endpoints": ["/", "/chat", "/ask", "/ask/batch", "/api/chat/stream", "/admin/reload", "/health", "/livez", "/readyz", "/docs", "/redoc"],
+        "ai_capabilities": ["文档理解", "语义搜索"],
+        "embedding_cache": embedding_cache,
+        "query_cache": query_cache,
+        "semantic_cache": semantic_cache.stats(),
+        "index": {
+            "collection": vector_search.collection_name,
+            "version": vector_search.version,
+            "reload": vector_search.reload_status
+        } if vector_search is not None else None
     }
 
+def build_answer(relevant_docs: List[str]) -> dict:
+    """根据检索结果生成回答（这里简化为返回最相关文档）"""
+    if relevant_docs:
+        best_doc = relevant_docs[0]
+        return {
+            "status": "success",
+            "answer": f"根据相关信息：{best_doc[:200]}...",
+            "confidence": 0.5,
+            "sources": relevant_docs[:3]
+        }
+    return {
+        "status": "success",
+        "answer": "抱歉，我没有找到相关的信息来回答您的问题。",
+        "confidence": 0.0,
+        "sources": []
+    }
+
+def answer_questions(questions: List[str], top_k: int) -> List[dict]:
+    """批量检索并生成回答（阻塞调用，在推理线程池中执行）"""
+    timestamp = datetime.now().isoformat()
+    return [
+        {**build_answer(relevant_docs), "timestamp": timestamp}
+        for relevant_docs in vector_search.search_many(questions, top_k=top_k)
+    ]
+
+def answer_question(question: str) -> dict:
+    """检索并生成回答（阻塞调用，在推理线程池中执行）"""
+    # 语义缓存：相近问题直接复用之前的检索结果和答案（SEMANTIC_CACHE_SIZE<=0 时禁用）
+    query_embedding = vector_search.embed_query(question)
+    if semantic_cache.enabled:
+        cached = semantic_cache.lookup(query_embedding, vector_search.version)
+        if cached is not None:
+            logger.info("命中语义缓存")
+            return {**cached, "timestamp": datetime.now().isoformat()}
+    
+    # 搜索相关文档
+    relevant_docs = vector_search.search_by_embedding(query_embedding, top_k=3, query=question)
+    
+    result = build_answer(relevant_docs)
+    if semantic_cache.enabled:
+        semantic_cache.store(query_embedding, result, vector_search.version)
+    return {**result, "timestamp": datetime.now().isoformat()}
+
+def retrieve_documents(question: str) -> List[str]:
+    """与 /ask 相同的检索（阻塞调用，在推理线程池中执行）"""
+    return vector_search.search_by_embedding(vector_search.embed_query(question), top_k=3, query=question)
+
+def build_rag_messages(question: str, relevant_docs: List[str]) -> List[dict]:
+    """把检索到的文档作为参考资料交给大模型"""
+    context = "\n\n".join(f"[{i + 1}] {doc}" for i, doc in enumerate(relevant_docs))
+    return [
+        {"role": "system", "content": "你是专业的智能客服助手，请根据参考资料友好、准确地回答用户问题，资料中没有的信息不要编造。"},
+        {"role": "user", "content": f"参考资料：\n{context}\n\n问题：{question}"}
+    ]
+
 @app.post("/ask", response_model=QuestionResponse)
 async def ask_question(request: QuestionRequest):
     """问答接口"""
@@ -173,38 +377,212 @@ async def ask_question(request: QuestionRequest):
         if vector_search is None:
             raise HTTPException(status_code=503, detail="系统未初始化完成")
         
-        # 搜索相关文档
-        relevant_docs = vector_search.search(request.question, top_k=3)
-        
-        # 生成回答（这里简化为返回最相关文档）
-        if relevant_docs:
-            best_doc = relevant_docs[0]
-            answer = f"根据相关信息：{best_doc.get('content', '')[:200]}..."
-            confidence = best_doc.get('score', 0.5)
-            
-            response = {
-                "status": "success",
-                "answer": answer,
-                "confidence": float(confidence),
-                "sources": relevant_docs[:3],
-                "timestamp": datetime.now().isoformat()
-            }
-        else:
-            response = {
-                "status": "success",
-                "answer": "抱歉，我没有找到相关的信息来回答您的问题。",
-                "confidence": 0.0,
-                "sources": [],
-                "timestamp": datetime.now().isoformat()
-            }
+        try:
+            response = await inference_executor.run(answer_question, request.question)
+        except ExecutorBusyError:
+            logger.warning("推理队列已满，拒绝请求")
+            raise HTTPException(status_code=503, detail="系统繁忙，请稍后重试")
         
         logger.info(f"问题处理完成")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"处理问题时出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: QuestionRequest):
+    """
+    流式问答：检索与 /ask 相同，回答由大模型根据检索到的文档逐段生成，以Server-Sent Events返回
+
+    事件格式：
+        data: {"token": "..."}                                            回答片段
+        data: {"done": true, "confidence": ..., "sources": [...], ...}    结束，置信度和来源与 /ask 相同
+        event: error / data: {"error": "..."}                             出错
+    未配置 LLM_API_KEY、没有检索到文档，或大模型在产出首个token之前失败时，回答为 /ask 的检索摘要
+    """
+    logger.info(f"收到流式问题: {request.question}")
+    if vector_search is None:
+        raise HTTPException(status_code=503, detail="系统未初始化完成")
+    
+    start = time.perf_counter()
+    try:
+        relevant_docs = await inference_executor.run(retrieve_documents, request.question)
+    except ExecutorBusyError:
+        logger.warning("推理队列已满，拒绝请求")
+        raise HTTPException(status_code=503, detail="系统繁忙，请稍后重试")
+    summary = build_answer(relevant_docs)
+    
+    async def events():
+        first_token = None
+        try:
+            if relevant_docs and config.LLM_API_KEY:
+                try:
+                    async for chunk in llm_client.stream_chat(
+                        config.LLM_BASE_URL, config.LLM_API_KEY, config.LLM_MODEL,
+                        build_rag_messages(request.question, relevant_docs),
+                        temperature=0.7, max_tokens=config.LLM_MAX_TOKENS
+                    ):
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                            LLM_FIRST_TOKEN_SECONDS.labels(model=config.LLM_MODEL).observe(first_token)
+                        yield format_sse({"token": chunk})
+                except LLMError as e:
+                    # 已经输出过内容时不能再换成摘要，否则浏览器里会拼出两段回答
+                    if first_token is not None:
+                        raise
+                    logger.warning(f"大模型调用失败，返回检索摘要: {e}")
+            
+            if first_token is None:
+                yield format_sse({"token": summary["answer"]})
+            else:
+                LLM_STREAM_SECONDS.labels(model=config.LLM_MODEL).observe(time.perf_counter() - start)
+            yield format_sse({
+                "done": True,
+                "model": config.LLM_MODEL if first_token is not None else None,
+                "confidence": summary["confidence"],
+                "sources": summary["sources"],
+                "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                "total_ms": round((time.perf_counter() - start) * 1000, 1)
+            })
+        except Exception as e:
+            logger.error(f"流式生成失败: {e}")
+            yield format_sse({"error": f"抱歉，回答生成中断：{str(e)}"}, event="error")
+    
+    # X-Accel-Buffering 关闭Nginx对本响应的缓冲，保证token及时送达浏览器
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/ask/batch", response_model=BatchQuestionResponse)
+async def ask_batch(request: BatchQuestionRequest):
+    """批量问答接口：一次前向计算和一次向量数据库查询回答全部问题（用于离线评测）"""
+    try:
+        logger.info(f"收到批量问题: {len(request.questions)} 个")
+        
+        if vector_search is None:
+            raise HTTPException(status_code=503, detail="系统未初始化完成")
+        if len(request.questions) > config.MAX_BATCH_QUESTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"单次最多 {config.MAX_BATCH_QUESTIONS} 个问题"
+            )
+        
+        try:
+            results = await inference_executor.run(answer_questions, request.questions, request.top_k)
+        except ExecutorBusyError:
+            logger.warning("推理队列已满，拒绝请求")
+            raise HTTPException(status_code=503, detail="系统繁忙，请稍后重试")
+        
+        return {"status": "success", "results": results}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"处理批量问题时出错: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def check_admin_token(token: Optional[str]):
+    """校验管理接口令牌（未配置 ADMIN_TOKEN 时管理接口不可用）"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理接口未启用")
+    if not token or not hmac.compare_digest(token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="管理令牌无效")
+
+@app.post("/admin/reload", status_code=202)
+async def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    """后台重建知识库索引，完成后原子切换，重建期间问答不受影响"""
+    check_admin_token(x_admin_token)
+    if vector_search is None or processor is None:
+        raise HTTPException(status_code=503, detail="系统未初始化完成")
+    if preloaded_search is not None:
+        # 每个worker各自持有索引引用，只在一个worker里切换会导致各worker结果不一致
+        raise HTTPException(status_code=409, detail="prefork 模式不支持在线重建，请用 python -m src.ingest 重建后重启服务")
+    if not os.path.exists(config.KNOWLEDGE_PATH):
+        raise HTTPException(status_code=404, detail=f"数据文件不存在: {config.KNOWLEDGE_PATH}")
+    
+    try:
+        started = vector_search.reload_in_background(processor.iter_chunks(config.KNOWLEDGE_PATH))
+    except IndexSharedError as e:
+        # 多个worker各自持有索引引用，只在一个worker里切换会让其他worker查询已删除的集合
+        raise HTTPException(status_code=409, detail=f"{e}，请用 python -m src.ingest 重建后重启服务")
+    if not started:
+        raise HTTPException(status_code=409, detail="已有重建任务在执行")
+    logger.info(f"🔄 已开始后台重建索引: {config.KNOWLEDGE_PATH}")
+    return vector_search.reload_status
+
+@app.get("/admin/reload")
+async def admin_reload_status(x_admin_token: Optional[str] = Header(None)):
+    """查询最近一次重建的状态"""
+    check_admin_token(x_admin_token)
+    if vector_search is None:
+        raise HTTPException(status_code=503, detail="系统未初始化完成")
+    return vector_search.reload_status
+
+def profile_response(counts, interval: float, fmt: str):
+    """按格式返回采样结果，以附件形式下载"""
+    if fmt not in profiler.FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {fmt}（可选: {', '.join(profiler.FORMATS)}）")
+    filename = f"profile-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}"
+    if fmt == "speedscope":
+        return JSONResponse(
+            content=profiler.export(counts, interval, fmt),
+            headers={"Content-Disposition": f'attachment; filename="{filename}.speedscope.json"'}
+        )
+    return PlainTextResponse(
+        profiler.export(counts, interval, fmt),
+        headers={"Content-Disposition": f'attachment; filename="{filename}.collapsed.txt"'}
+    )
+
+@app.get("/admin/profile")
+async def admin_profile(seconds: float = 10, hz: float = 100, format: str = "collapsed",
+                        x_admin_token: Optional[str] = Header(None)):
+    """
+    对本进程采样分析 seconds 秒，返回所有线程的调用栈统计
+
+    format: collapsed（折叠栈，可用 flamegraph.pl 生成火焰图）或 speedscope（导入 https://www.speedscope.app）
+    prefork 模式下只分析处理本请求的worker
+    """
+    check_admin_token(x_admin_token)
+    if not 0 < seconds <= config.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds 需在 (0, {config.PROFILE_MAX_SECONDS}] 范围内")
+    if not 0 < hz <= 1000:
+        raise HTTPException(status_code=400, detail="hz 需在 (0, 1000] 范围内")
+    if format not in profiler.FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {format}（可选: {', '.join(profiler.FORMATS)}）")
+    
+    logger.info(f"🔬 开始采样分析: {seconds}s @ {hz}Hz")
+    try:
+        counts = await asyncio.get_running_loop().run_in_executor(None, profiler.profile, seconds, hz)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_response(counts, 1.0 / hz, format)
+
+@app.get("/admin/profile/continuous")
+async def admin_profile_continuous(seconds: Optional[float] = None, format: str = "collapsed",
+                                   x_admin_token: Optional[str] = Header(None)):
+    """导出持续采样最近 seconds 秒（默认整个窗口）的滚动火焰图"""
+    check_admin_token(x_admin_token)
+    if continuous_profiler is None:
+        raise HTTPException(status_code=409, detail="持续采样已禁用（PROFILER_HZ=0）")
+    if not continuous_profiler.running and not continuous_profiler.stats()["covered_seconds"]:
+        raise HTTPException(status_code=409, detail="持续采样未开启")
+    return profile_response(continuous_profiler.snapshot(seconds), continuous_profiler.interval, format)
+
+@app.post("/admin/profile/continuous")
+async def admin_profile_continuous_toggle(enabled: bool = True, x_admin_token: Optional[str] = Header(None)):
+    """开启或关闭持续采样"""
+    check_admin_token(x_admin_token)
+    if continuous_profiler is None:
+        raise HTTPException(status_code=409, detail="持续采样已禁用（PROFILER_HZ=0）")
+    if enabled:
+        continuous_profiler.start()
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, continuous_profiler.stop)
+    logger.info(f"🔬 持续采样已{'开启' if enabled else '关闭'}")
+    return continuous_profiler.stats()
+
 if __name__ == "__main__":
     logger.info("🌐 启动Web服务...")
     logger.info("📍 服务地址: http://localhost:8000")
@@ -8,12 +8,12 @@ import os
 import time
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import uvicorn
 
 # ========== 添加监控相关导入 ==========
@@ -21,9 +21,17 @@ from prometheus_client import (
     Counter, Histogram, Gauge, generate_latest, 
     CONTENT_TYPE_LATEST, REGISTRY, start_http_server
 )
-import psutil
+from prometheus_client.openmetrics import exposition as openmetrics
 import json
 
+from config import config
+from .document_processor import DocumentProcessor
+from .vector_search import VectorSearch
+from .query_cache import QueryEmbeddingCache
+from .system_sampler import SystemMetricsSampler
+from .inference_executor import BoundedExecutor, ExecutorBusyError
+from .tracing import start_trace
+
 # ========== 定义Prometheus指标 ==========
 # 请求相关指标
 REQUEST_COUNT = Counter(
@@ -51,47 +59,24 @@ RAG_QUERY_LATENCY = Histogram(
     ['query_type']
 )
 
+# 查询嵌入缓存命中情况（命中率 = hit / (hit + miss)）
+QUERY_EMBEDDING_CACHE_REQUESTS = Counter(
+    'query_embedding_cache_requests_total',
+    'Query embedding cache lookups',
+    ['result']
+)
+
 # 系统资源指标
 CPU_USAGE = Gauge('system_cpu_usage_percent', 'System CPU usage percentage')
 MEMORY_USAGE = Gauge('system_memory_usage_percent', 'System memory usage percentage')
-ACTIVE_CONNECTIONS = Gauge('active_connections', 'Number of active connections')
-
-# ========== 中间件：收集请求指标 ==========
-@app.middleware("http")
-async def monitor_requests(request: Request, call_next):
-    start_time = time.time()
-    method = request.method
-    endpoint = request.url.path
-    
-    try:
-        response = await call_next(request)
-        
-        # 记录请求指标
-        REQUEST_COUNT.labels(
-            method=method,
-            endpoint=endpoint,
-            status_code=response.status_code
-        ).inc()
-        
-        REQUEST_LATENCY.labels(
-            method=method,
-            endpoint=endpoint
-        ).observe(time.time() - start_time)
-        
-        return response
-        
-    except Exception as e:
-        REQUEST_COUNT.labels(
-            method=method,
-            endpoint=endpoint,
-            status_code=500
-        ).inc()
-        raise e
+# 由请求中间件增减，即本服务正在处理的请求数
+ACTIVE_CONNECTIONS = Gauge('active_connections', 'Number of in-flight HTTP requests')
 
 # ========== 数据模型 ==========
 class Question(BaseModel):
     question: str
-    top_k: Optional[int] = 3
+    top_k: int = Field(3, ge=1, le=config.MAX_TOP_K)
+    debug: Optional[bool] = False  # 为True时在响应中返回各阶段耗时
 
 class Answer(BaseModel):
     question: str
@@ -99,29 +84,45 @@ class Answer(BaseModel):
     relevant_documents: List[str]
     processing_time: float
     model_version: str = "1.0.0"
+    timings: Optional[Dict[str, float]] = None  # 各阶段耗时（毫秒），仅debug请求返回
 
 # ========== 系统状态监控 ==========
+def update_resource_gauges(snapshot: dict):
+    """采样器每次采样后更新资源指标"""
+    CPU_USAGE.set(snapshot["cpu_percent"])
+    MEMORY_USAGE.set(snapshot["memory_percent"])
+
+# 后台定期采样，请求路径上只读取最近一次的快照，不会阻塞事件循环
+system_sampler = SystemMetricsSampler(
+    interval=config.SYSTEM_SAMPLE_INTERVAL,
+    on_sample=update_resource_gauges
+)
+active_requests = 0
+
 def get_system_metrics():
-    """收集系统指标"""
-    CPU_USAGE.set(psutil.cpu_percent(interval=1))
-    MEMORY_USAGE.set(psutil.virtual_memory().percent)
-    
-    # 获取网络连接数（简化版）
-    connections = len(psutil.net_connections())
-    ACTIVE_CONNECTIONS.set(connections)
-    
+    """返回最近一次采样的系统指标和当前处理中的请求数"""
     return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "memory_percent": psutil.virtual_memory().percent,
-        "active_connections": connections,
-        "disk_usage": psutil.disk_usage('/').percent,
-        "timestamp": datetime.now().isoformat()
+        **system_sampler.snapshot,
+        "active_connections": active_requests
     }
 
 # ========== FastAPI应用 ==========
+vector_search = None
+# 模型推理和向量检索在独立线程池中执行，避免阻塞事件循环（/health、/metrics 不会排在慢查询后面）
+inference_executor = BoundedExecutor(
+    max_workers=config.INFERENCE_WORKERS,
+    max_queue=config.INFERENCE_QUEUE_SIZE
+)
+
+def record_query_cache_lookup(hit: bool):
+    """上报查询嵌入缓存的命中/未命中"""
+    QUERY_EMBEDDING_CACHE_REQUESTS.labels(result="hit" if hit else "miss").inc()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
+    global vector_search
+    
     # 启动时
     print("🚀 启动智能客服系统（MLOps监控版）...")
     
@@ -129,10 +130,45 @@ async def lifespan(app: FastAPI):
     start_http_server(8001)
     print("📊 Prometheus指标服务器启动在端口 8001")
     
+    # 初始化检索系统，查询嵌入缓存的命中情况上报到Prometheus
+    query_cache = QueryEmbeddingCache(
+        maxsize=config.QUERY_CACHE_SIZE,
+        ttl=config.QUERY_CACHE_TTL,
+        on_lookup=record_query_cache_lookup
+    )
+    vector_search = VectorSearch(
+        persist_directory=config.VECTOR_DB_PATH,
+        model_path=config.EMBEDDING_MODEL,
+        batch_size=config.EMBEDDING_BATCH_SIZE,
+        cache_dir=config.EMBEDDING_CACHE_DIR,
+        cache_size=config.EMBEDDING_CACHE_SIZE,
+        query_cache=query_cache,
+        query_batch_size=config.QUERY_BATCH_MAX_SIZE,
+        query_batch_wait_ms=config.query_batch_wait_ms,
+        index_backend=config.VECTOR_INDEX_BACKEND,
+        retrieval_mode=config.RETRIEVAL_MODE,
+        keyword_tokenizer=config.KEYWORD_TOKENIZER
+    )
+    if os.path.exists(config.KNOWLEDGE_PATH):
+        processor = DocumentProcessor(
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP,
+            tokenizer=vector_search.chunking_tokenizer()
+        )
+        vector_search.add_documents_stream(processor.iter_chunks(config.KNOWLEDGE_PATH))
+    else:
+        print(f"⚠️  数据文件不存在: {config.KNOWLEDGE_PATH}")
+    
+    system_sampler.start()
+    
     yield  # 应用运行中
     
     # 关闭时
     print("🛑 正在关闭智能客服系统...")
+    await system_sampler.stop()
+    inference_executor.shutdown()
+    if vector_search.embedding_cache is not None:
+        vector_search.embedding_cache.close()
 
 app = FastAPI(
     title="智能客服系统 - MLOps增强版",
@@ -141,6 +177,44 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# ========== 中间件：收集请求指标 ==========
+@app.middleware("http")
+async def monitor_requests(request: Request, call_next):
+    global active_requests
+    start_time = time.time()
+    method = request.method
+    endpoint = request.url.path
+    active_requests += 1
+    ACTIVE_CONNECTIONS.inc()
+    
+    try:
+        response = await call_next(request)
+        
+        # 记录请求指标
+        REQUEST_COUNT.labels(
+            method=method,
+            endpoint=endpoint,
+            status_code=response.status_code
+        ).inc()
+        
+        REQUEST_LATENCY.labels(
+            method=method,
+            endpoint=endpoint
+        ).observe(time.time() - start_time)
+        
+        return response
+        
+    except Exception as e:
+        REQUEST_COUNT.labels(
+            method=method,
+            endpoint=endpoint,
+            status_code=500
+        ).inc()
+        raise e
+    finally:
+        active_requests -= 1
+        ACTIVE_CONNECTIONS.dec()
+
 # ========== API端点 ==========
 @app.get("/")
 async def root():
@@ -180,10 +254,14 @@ async def health_check():
     }
 
 @app.get("/metrics")
-async def metrics():
-    """Prometheus指标端点"""
-    # 更新系统指标
-    get_system_metrics()
+async def metrics(request: Request):
+    """Prometheus指标端点（资源指标由后台采样器更新）"""
+    # 各阶段耗时直方图的exemplar（trace_id）只在OpenMetrics格式中输出
+    if "application/openmetrics-text" in request.headers.get("accept", ""):
+        return Response(
+            openmetrics.generate_latest(REGISTRY),
+            media_type=openmetrics.CONTENT_TYPE_LATEST
+        )
     
     # 返回所有指标
     return Response(
@@ -210,15 +288,29 @@ async def system_status():
 async def ask(question: Question):
     """智能问答端点（带监控）"""
     start_time = time.time()
+    # 开启本次请求的追踪：嵌入、检索各阶段分别计时
+    trace = start_trace()
     
     try:
         # 记录查询
         RAG_QUERY_COUNT.labels(query_type="general").inc()
         
-        # TODO: 这里调用你的RAG逻辑
-        # 暂时用模拟数据
-        answer = "这是模拟回答"
-        relevant_docs = ["文档1", "文档2", "文档3"]
+        if vector_search is None:
+            raise HTTPException(status_code=503, detail="系统未初始化完成")
+        
+        # 执行器在调用方上下文的副本中运行，线程中的各阶段耗时仍记入本次追踪
+        try:
+            relevant_docs = await inference_executor.run(
+                vector_search.search, question.question, top_k=question.top_k
+            )
+        except ExecutorBusyError:
+            RAG_QUERY_COUNT.labels(query_type="rejected").inc()
+            raise HTTPException(status_code=503, detail="系统繁忙，请稍后重试")
+        # 回答直接取自检索结果，没有模型生成步骤，因此不记 generate 阶段
+        if relevant_docs:
+            answer = f"根据相关信息：{relevant_docs[0][:200]}..."
+        else:
+            answer = "抱歉，我没有找到相关的信息来回答您的问题。"
         
         processing_time = time.time() - start_time
         
@@ -229,9 +321,12 @@ async def ask(question: Question):
             question=question.question,
             answer=answer,
             relevant_documents=relevant_docs,
-            processing_time=round(processing_time, 3)
+            processing_time=round(processing_time, 3),
+            timings=trace.breakdown() if question.debug else None
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         RAG_QUERY_COUNT.labels(query_type="error").inc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+BM25关键词索引 - 混合检索中的稀疏检索部分
+功能：订单号、电话号码（如 400-123-4567）、商品SKU等精确字符串，
+     稠密向量很难区分，倒排索引可以精确命中
+分词：英文/数字串整体作为一个词，中文按字符bigram切分（安装了jieba时可改用jieba）
+"""
+
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+# 英文、数字及其中间的连字符/下划线/点号视为一个整体，如 400-123-4567、SKU_A12.3
+_ASCII_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[-_.][A-Za-z0-9]+)*")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+
+
+def tokenize(text: str, tokenizer: str = "ngram") -> List[str]:
+    """
+    切分文本为检索词
+
+    Args:
+        text: 待切分文本
+        tokenizer: ngram（中文字符bigram）或 jieba
+    """
+    tokens = [token.lower() for token in _ASCII_TOKEN.findall(text)]
+    for run in _CJK_RUN.findall(text):
+        if tokenizer == "jieba" and jieba is not None:
+            tokens.extend(jieba.lcut_for_search(run))
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75, tokenizer: str = "ngram"):
+        """
+        初始化BM25索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+            tokenizer: 分词方式，ngram 或 jieba
+        """
+        if tokenizer == "jieba" and jieba is None:
+            raise ImportError("tokenizer='jieba' 需要先安装 jieba")
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+
+        # 倒排表：词 -> {文档ID: 词频}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.documents: Dict[str, str] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def count(self) -> int:
+        """索引中的文档数量"""
+        return len(self.doc_lengths)
+
+    def add(self, ids: List[str], documents: List[str]):
+        """添加文档（ID已存在时先删除旧内容）"""
+        with self._lock:
+            for doc_id, document in zip(ids, documents):
+                if doc_id in self.doc_lengths:
+                    self.delete([doc_id])
+                terms = tokenize(document, self.tokenizer)
+                for term, freq in Counter(terms).items():
+                    self.postings.setdefault(term, {})[doc_id] = freq
+                self.doc_lengths[doc_id] = len(terms)
+                self.documents[doc_id] = document
+                self._total_length += len(terms)
+
+    def delete(self, ids: List[str]):
+        """删除文档"""
+        with self._lock:
+            for doc_id in ids:
+                document = self.documents.pop(doc_id, None)
+                if document is None:
+                    continue
+                for term in set(tokenize(document, self.tokenizer)):
+                    posting = self.postings.get(term)
+                    if posting is not None:
+                        posting.pop(doc_id, None)
+                        if not posting:
+                            del self.postings[term]
+                self._total_length -= self.doc_lengths.pop(doc_id)
+
+    def sync(self, documents: Dict[str, str]):
+        """与给定的 {文档ID: 文本} 保持一致：补充缺少的、删除多余的"""
+        with self._lock:
+            removed = [doc_id for doc_id in self.documents if doc_id not in documents]
+            added = [doc_id for doc_id in documents if doc_id not in self.documents]
+            self.delete(removed)
+            self.add(added, [documents[doc_id] for doc_id in added])
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """返回BM25得分最高的 (文档ID, 得分) 列表"""
+        terms = tokenize(query, self.tokenizer)
+        with self._lock:
+            n = len(self.doc_lengths)
+            if n == 0 or not terms:
+                return []
+            avg_length = self._total_length / n
+
+            scores: Dict[str, float] = {}
+            for term, query_freq in Counter(terms).items():
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, freq in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + query_freq * idf * freq * (self.k1 + 1) / (freq + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    倒数排名融合（RRF）：score(d) = Σ 1 / (k + rank(d))
+
+    Args:
+        rankings: 多路检索结果，每路为按相关度排序的文档ID列表
+        k: 平滑常数，越大越削弱头部排名的优势
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
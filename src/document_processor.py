@@ -3,49 +3,203 @@
 文档处理器 - 使用已安装的库
 功能：将长文档分割成适合AI处理的小文本
 核心思想：大文档——>小片段——>更好的搜索效果
+流式处理：逐行读取文件、逐块产出，内存占用与语料大小无关
+中文切分：按句末标点（。！？；）切句，再按长度预算把句子拼成块，不依赖空格
 """
 
 import os
-from typing import List
+import re
+from typing import Iterator, List, Optional
+
+# 句子 = 非句末字符 + 句末标点（可选，段落最后一句可能没有标点）
+_SENTENCE = re.compile(r"[^。！？；!?;\n]+[。！？；!?;\n]*|[。！？；!?;\n]+")
 
 class DocumentProcessor:
-    def __init__(self, chunk_size: int = 300):
+    # 一次分词调用最多处理的段落字符数：整窗口的句子一起送入tokenizer做批量计算
+    TOKENIZE_WINDOW = 65536
+
+    def __init__(self, chunk_size: int = 300, extensions: tuple = (".txt", ".md"),
+                 tokenizer=None, chunk_overlap: int = 0):
+        """
+        Args:
+            chunk_size: 每块的长度上限；提供tokenizer时按token数计算，否则按字符数
+            extensions: 处理目录时只读取这些扩展名的文件
+            tokenizer: 嵌入模型的tokenizer，用于按真实token数控制块大小
+            chunk_overlap: 相邻块之间重叠的长度（按整句计算，单位同 chunk_size）
+        """
         self.chunk_size = chunk_size
+        self.extensions = extensions
+        self.tokenizer = tokenizer
+        self.chunk_overlap = chunk_overlap
     
     def load_documents(self, file_path: str) -> List[str]:
         """加载文档并切分成块"""
         print("📖 正在加载文档...")
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        chunks = list(self.iter_chunks(file_path))
         
-        # 按空行分割段落
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
+        print(f"✅ 成功分割出 {len(chunks)} 个文本块")
+        return chunks
+    
+    def iter_files(self, path: str) -> Iterator[str]:
+        """列出路径下的全部文档文件（路径是文件时直接返回该文件）"""
+        if os.path.isfile(path):
+            yield path
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(self.extensions):
+                    yield os.path.join(root, name)
+    
+    def iter_chunks(self, path: str) -> Iterator[str]:
+        """流式切分文件或目录中的所有文档，逐块产出"""
+        for file_path in self.iter_files(path):
+            # 攒够一个窗口的段落再统一切分，使分词可以批量执行
+            window: List[str] = []
+            window_chars = 0
+            for para in self.iter_paragraphs(file_path):
+                window.append(para)
+                window_chars += len(para)
+                if window_chars >= self.TOKENIZE_WINDOW:
+                    yield from self.split_paragraphs(window)
+                    window, window_chars = [], 0
+            if window:
+                yield from self.split_paragraphs(window)
+    
+    def iter_paragraphs(self, file_path: str) -> Iterator[str]:
+        """逐行读取文件，按空行分割段落"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = []
+            for line in f:
+                line = line.rstrip('\n')
+                if line:
+                    lines.append(line)
+                elif lines:
+                    para = '\n'.join(lines).strip()
+                    if para:
+                        yield para
+                    lines = []
+            if lines:
+                para = '\n'.join(lines).strip()
+                if para:
+                    yield para
+    
+    def split_paragraph(self, para: str) -> List[str]:
+        """如果段落太长，进一步切分"""
+        return self.split_paragraphs([para])
+    
+    def split_paragraphs(self, paragraphs: List[str]) -> List[str]:
+        """
+        切分一组段落：先切句，所有句子一次性计算长度，再逐段把句子拼成不超过 chunk_size 的块
+        """
+        sentences_per_para = [self._split_sentences(para) for para in paragraphs]
+        flat = [sentence for sentences in sentences_per_para for sentence in sentences]
+        lengths, offsets = self._measure(flat)
         
         chunks = []
-        for para in paragraphs:
-            # 如果段落太长，进一步切分
-            if len(para) > self.chunk_size:
-                words = para.split()
-                current_chunk = []
-                current_length = 0
-                
-                for word in words:
-                    if current_length + len(word) + 1 > self.chunk_size:
-                        chunks.append(' '.join(current_chunk))
-                        current_chunk = [word]
-                        current_length = len(word)
-                    else:
-                        current_chunk.append(word)
-                        current_length += len(word) + 1
-                
-                if current_chunk:
-                    chunks.append(' '.join(current_chunk))
-            else:
+        position = 0
+        for para, sentences in zip(paragraphs, sentences_per_para):
+            count = len(sentences)
+            para_lengths = lengths[position:position + count]
+            para_offsets = offsets[position:position + count] if offsets is not None else None
+            position += count
+            if sum(para_lengths) <= self.chunk_size:
                 chunks.append(para)
-        
-        print(f"✅ 成功分割出 {len(chunks)} 个文本块")
+            else:
+                chunks.extend(self._pack(sentences, para_lengths, para_offsets))
         return chunks
+    
+    @staticmethod
+    def _split_sentences(para: str) -> List[str]:
+        """按句末标点切句，标点保留在句尾"""
+        return [sentence for sentence in _SENTENCE.findall(para) if sentence.strip()]
+    
+    def _measure(self, sentences: List[str]):
+        """
+        计算每个句子的长度：有tokenizer时为token数（一次批量调用），否则为字符数
+
+        返回 (长度列表, 每个token的字符区间列表或None)
+        """
+        if not sentences:
+            return [], None
+        if self.tokenizer is None:
+            return [len(sentence) for sentence in sentences], None
+        # 只有fast tokenizer支持返回字符区间，否则超长句退回按字符硬切
+        with_offsets = getattr(self.tokenizer, "is_fast", False)
+        encoded = self.tokenizer(sentences, add_special_tokens=False, return_offsets_mapping=with_offsets)
+        offsets = encoded["offset_mapping"] if with_offsets else None
+        return [len(ids) for ids in encoded["input_ids"]], offsets
+    
+    def _pack(self, sentences: List[str], lengths: List[int], offsets=None) -> List[str]:
+        """贪心地把句子拼成块，相邻块之间保留不超过 chunk_overlap 的整句重叠"""
+        chunks = []
+        current: List[str] = []
+        current_lengths: List[int] = []
+        
+        for i, (sentence, length) in enumerate(zip(sentences, lengths)):
+            if length > self.chunk_size:
+                # 单句超长（如没有标点的长文本），单独硬切
+                if current:
+                    chunks.append(''.join(current))
+                    current, current_lengths = [], []
+                chunks.extend(self._hard_split(sentence, offsets[i] if offsets is not None else None))
+                continue
+            
+            if current and sum(current_lengths) + length > self.chunk_size:
+                chunks.append(''.join(current))
+                # 从上一块末尾保留若干整句作为重叠
+                overlap: List[str] = []
+                overlap_lengths: List[int] = []
+                for prev, prev_length in zip(reversed(current), reversed(current_lengths)):
+                    if sum(overlap_lengths) + prev_length > self.chunk_overlap or \
+                            sum(overlap_lengths) + prev_length + length > self.chunk_size:
+                        break
+                    overlap.insert(0, prev)
+                    overlap_lengths.insert(0, prev_length)
+                current, current_lengths = overlap, overlap_lengths
+            
+            current.append(sentence)
+            current_lengths.append(length)
+        
+        if current:
+            chunks.append(''.join(current))
+        return [chunk.strip() for chunk in chunks if chunk.strip()]
+    
+    def _hard_split(self, sentence: str, token_offsets=None) -> List[str]:
+        """把超长句子按长度预算硬切：有token区间时按token边界切，否则按空格或字符切"""
+        if token_offsets is not None:
+            pieces = []
+            for start in range(0, len(token_offsets), self.chunk_size):
+                window = token_offsets[start:start + self.chunk_size]
+                pieces.append(sentence[window[0][0]:window[-1][1]])
+            return pieces
+        
+        if ' ' not in sentence.strip():
+            return [sentence[i:i + self.chunk_size] for i in range(0, len(sentence), self.chunk_size)]
+        
+        # 含空格的文本（如英文）按单词拼接
+        pieces = []
+        current_chunk = []
+        current_length = 0
+        for word in sentence.split():
+            if len(word) > self.chunk_size:
+                # 单个“单词”仍超长（如夹了一个空格的中文长句），按字符切
+                if current_chunk:
+                    pieces.append(' '.join(current_chunk))
+                    current_chunk, current_length = [], 0
+                pieces.extend(word[i:i + self.chunk_size] for i in range(0, len(word), self.chunk_size))
+                continue
+            if current_chunk and current_length + len(word) + 1 > self.chunk_size:
+                pieces.append(' '.join(current_chunk))
+                current_chunk = [word]
+                current_length = len(word)
+            else:
+                current_chunk.append(word)
+                current_length += len(word) + 1
+        if current_chunk:
+            pieces.append(' '.join(current_chunk))
+        return pieces
 
 # 测试这个模块
 if __name__ == "__main__":
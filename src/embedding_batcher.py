@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+查询嵌入微批调度器 - 合并并发到达的查询，一次前向计算完成
+功能：第一条查询到达后最多等待 max_wait_ms 毫秒或凑满 max_batch_size 条，
+     作为一个填充批次送入模型，再把结果分发回各个等待中的调用方
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+from prometheus_client import Histogram
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    'embedding_batch_size',
+    'Number of query embeddings coalesced into one forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+EMBEDDING_QUEUE_WAIT = Histogram(
+    'embedding_batch_queue_wait_seconds',
+    'Time a query embedding waits before its batch starts',
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+)
+
+
+class EmbeddingBatcher:
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = 16, max_wait_ms: float = 2.0):
+        """
+        初始化微批调度器
+
+        Args:
+            embed_fn: 批量编码函数，输入文本列表，返回同顺序的向量列表
+            max_batch_size: 每批最多合并的查询数
+            max_wait_ms: 第一条查询到达后最多等待的毫秒数
+        """
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str) -> List[float]:
+        """提交一条查询并阻塞等待其向量"""
+        future: Future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future.result()
+
+    def _collect_batch(self, first) -> list:
+        """从第一条请求开始，在等待窗口内尽量凑满一批"""
+        batch = [first]
+        deadline = first[1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                # 已在排队的请求直接并入本批；队列空了才在等待窗口内继续等
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                # 关闭信号放回队列，处理完当前批次后退出
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect_batch(first)
+
+            started = time.perf_counter()
+            EMBEDDING_BATCH_SIZE.observe(len(batch))
+            for _, enqueued, _ in batch:
+                EMBEDDING_QUEUE_WAIT.observe(started - enqueued)
+
+            try:
+                embeddings = self.embed_fn([text for text, _, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, _, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+
+    def close(self):
+        """停止调度线程（已提交的请求会先处理完）"""
+        self._queue.put(None)
+        self._thread.join()
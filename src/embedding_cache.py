@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+嵌入缓存模块 - 基于内存映射文件的持久化向量缓存
+功能：相同文本（规范化后）在同一模型下只计算一次嵌入
+存储：float16向量存放在内存映射文件中，键到槽位的LRU索引存为JSON，
+     每个槽位另存一份所属键的摘要，索引落后于向量文件时（进程在两次落盘之间被杀）读到的不会是别的文本的向量
+并发：同一目录同一时刻只能被一个进程打开（文件锁），多进程部署时其余进程不启用缓存
+"""
+
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，不做跨进程保护
+    fcntl = None
+
+
+class CacheLockedError(Exception):
+    """缓存目录已被其他进程占用"""
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: str, dim: int, capacity: int = 100000, flush_interval: float = 30):
+        """
+        初始化嵌入缓存
+
+        Args:
+            cache_dir: 缓存目录
+            dim: 向量维度
+            capacity: 最多缓存的向量数量，超出后按LRU淘汰
+            flush_interval: 后台线程检查并落盘索引的间隔（秒），写入路径上不做落盘
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        # 槽位分配只在本进程内存中维护，两个进程同时写同一个文件会互相覆盖槽位、返回错误的向量，
+        # 所以用独占文件锁保证同一目录只有一个进程在用；锁随进程退出自动释放
+        self._lock_file = open(os.path.join(cache_dir, f"cache_{dim}.lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise CacheLockedError(f"嵌入缓存目录已被其他进程使用: {cache_dir}")
+        self.dim = dim
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.vectors_path = os.path.join(cache_dir, f"vectors_{dim}.f16")
+        self.index_path = os.path.join(cache_dir, f"index_{dim}.json")
+        self.digests_path = os.path.join(cache_dir, f"digests_{dim}.u64")
+
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        # 串行化落盘，和读写用的 _lock 分开，落盘期间不阻塞查询
+        self._flush_lock = threading.Lock()
+
+        # 键 -> 槽位，按最近使用顺序排列（最旧的在前）
+        self.slots: "OrderedDict[str, int]" = OrderedDict()
+
+        reuse = (self._file_matches(self.vectors_path, capacity * dim * np.dtype(np.float16).itemsize)
+                 and self._file_matches(self.digests_path, capacity * np.dtype(np.uint64).itemsize))
+        if reuse:
+            self._load_index()
+        mode = "r+" if reuse else "w+"
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float16, mode=mode, shape=(capacity, dim))
+        # 槽位 -> 当前存放的键的摘要，0 表示槽位正在写入或为空
+        self.digests = np.memmap(self.digests_path, dtype=np.uint64, mode=mode, shape=(capacity,))
+
+        used = set(self.slots.values())
+        self.free_slots = [slot for slot in range(capacity - 1, -1, -1) if slot not in used]
+
+        # 查询时未命中也会写入缓存，落盘放到后台线程，不占用请求路径
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="embedding-cache-flush", daemon=True)
+        self._flusher.start()
+
+    @staticmethod
+    def make_key(model_path: str, text: str) -> str:
+        """由模型路径和规范化后的文本生成缓存键"""
+        normalized = unicodedata.normalize("NFKC", " ".join(text.split()))
+        return hashlib.sha1(f"{model_path}\0{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _file_matches(path: str, size: int) -> bool:
+        return os.path.exists(path) and os.path.getsize(path) == size
+
+    @staticmethod
+    def _digest(key: str) -> int:
+        """键的64位摘要（保留0作为无效值）"""
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest or 1
+
+    def _load_index(self):
+        """从磁盘加载LRU索引，索引损坏时视为空缓存"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, slot in entries:
+            if 0 <= slot < self.capacity:
+                self.slots[key] = slot
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """查询缓存，命中时返回向量并标记为最近使用"""
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is not None and self.digests[slot] != self._digest(key):
+                # 磁盘索引落后于向量文件：该槽位在上次落盘后已被其他键复用，丢弃这条过期映射
+                del self.slots[key]
+                self.free_slots.append(slot)
+                self._pending_writes += 1
+                slot = None
+            if slot is None:
+                self.misses += 1
+                return None
+            self.slots.move_to_end(key)
+            self.hits += 1
+            return self.vectors[slot].astype(np.float32).tolist()
+
+    def put(self, key: str, vector: List[float]):
+        """写入向量，缓存已满时淘汰最久未使用的条目"""
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                if self.free_slots:
+                    slot = self.free_slots.pop()
+                else:
+                    _, slot = self.slots.popitem(last=False)
+                self.slots[key] = slot
+            else:
+                self.slots.move_to_end(key)
+            # 先作废摘要再写向量，写到一半中断时该槽位不会匹配任何键
+            self.digests[slot] = 0
+            self.vectors[slot] = np.asarray(vector, dtype=np.float16)
+            self.digests[slot] = self._digest(key)
+            self._pending_writes += 1
+
+    def flush(self):
+        """将向量和索引落盘（只在持锁期间复制一份索引，序列化和写文件不阻塞读写）"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending_writes:
+                    return
+                entries = list(self.slots.items())
+                self._pending_writes = 0
+            # 索引快照中的槽位对应的向量此前已写入，先落盘向量再替换索引
+            self.vectors.flush()
+            self.digests.flush()
+            # 先写临时文件再原子替换，避免进程中断时留下半个索引
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.index_path)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️  嵌入缓存落盘失败: {e}")
+
+    def close(self):
+        """落盘并停止后台线程"""
+        self._closed.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self.slots),
+            "capacity": self.capacity
+        }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+嵌入编码器后端 - 把文本编码为[CLS]向量
+支持的后端：
+    torch      PyTorch fp32（默认）
+    onnx       导出为ONNX后用ONNX Runtime推理
+    onnx-int8  在ONNX基础上做int8动态量化
+
+模型通过 "[后端:]模型路径" 指定，例如 "onnx-int8:/app/models/bge-small-zh"，
+省略后端时使用 torch。
+"""
+
+import os
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+from .tracing import span
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+
+
+def parse_model_spec(spec: str) -> Tuple[str, str]:
+    """解析 "[后端:]模型路径"，返回 (后端, 模型路径)"""
+    backend, sep, path = spec.partition(":")
+    if sep and backend in BACKENDS:
+        return backend, path
+    return DEFAULT_BACKEND, spec
+
+
+class TorchEncoder:
+    def __init__(self, model_path: str, max_length: int = 512, num_threads: int = 0):
+        """
+        加载PyTorch模型
+
+        Args:
+            num_threads: PyTorch算子内线程数，0表示由运行时决定（多进程时应固定，避免线程超额订阅）
+        """
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        self._torch = torch
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModel.from_pretrained(model_path)
+        # 设置模型为评估模式
+        self.model.eval()
+        self.dim = self.model.config.hidden_size
+        # fast tokenizer在多线程下同时设置padding/truncation会报 "Already borrowed"，需要串行调用
+        self._tokenizer_lock = threading.Lock()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """编码一批文本，返回 [len(texts), dim] 的float32矩阵"""
+        # padding=True 只填充到本批最长序列
+        with span("tokenize"), self._tokenizer_lock:
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True,
+                                    max_length=self.max_length)
+
+        with span("forward"), self._torch.no_grad():
+            outputs = self.model(**inputs)
+            # 使用[CLS] token的嵌入作为句子表示
+            return outputs.last_hidden_state[:, 0, :].numpy()
+
+
+class OnnxEncoder:
+    def __init__(self, model_path: str, quantize: bool = False, max_length: int = 512,
+                 onnx_dir: str = None, num_threads: int = 0):
+        """
+        加载ONNX Runtime推理会话，首次使用时自动导出（和量化）模型
+
+        Args:
+            model_path: HuggingFace格式的模型目录
+            quantize: 是否使用int8动态量化模型
+            max_length: 最大序列长度
+            onnx_dir: ONNX文件存放目录，默认为 <model_path>/onnx
+            num_threads: ONNX Runtime算子内线程数，0表示由运行时决定
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer, AutoConfig
+
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.dim = AutoConfig.from_pretrained(model_path).hidden_size
+        self._tokenizer_lock = threading.Lock()
+
+        onnx_dir = onnx_dir or os.path.join(model_path, "onnx")
+        onnx_path = os.path.join(onnx_dir, "model.onnx")
+        if not os.path.exists(onnx_path):
+            export_onnx(model_path, onnx_path)
+        if quantize:
+            int8_path = os.path.join(onnx_dir, "model.int8.onnx")
+            if not os.path.exists(int8_path):
+                quantize_onnx(onnx_path, int8_path)
+            onnx_path = int8_path
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """编码一批文本，返回 [len(texts), dim] 的float32矩阵"""
+        with span("tokenize"), self._tokenizer_lock:
+            inputs = self.tokenizer(texts, return_tensors="np", padding=True, truncation=True,
+                                    max_length=self.max_length)
+
+        feeds = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        with span("forward"):
+            last_hidden_state = self.session.run(["last_hidden_state"], feeds)[0]
+        return last_hidden_state[:, 0, :].astype(np.float32)
+
+
+def export_onnx(model_path: str, onnx_path: str, opset: int = 14):
+    """把HuggingFace模型导出为ONNX（batch和序列长度均为动态维度）"""
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    print(f"🔄 正在导出ONNX模型: {onnx_path}")
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModel.from_pretrained(model_path)
+    model.eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(["导出示例文本", "示例"], return_tensors="pt", padding=True)
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    # 先写临时文件再改名，避免导出中断时留下损坏的模型
+    tmp_path = f"{onnx_path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["last_hidden_state", "pooler_output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    os.replace(tmp_path, onnx_path)
+    print("✅ ONNX模型导出完成")
+
+
+def quantize_onnx(onnx_path: str, output_path: str):
+    """对ONNX模型做int8动态量化（权重int8，激活值运行时量化）"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    print(f"🔄 正在量化ONNX模型: {output_path}")
+    tmp_path = f"{output_path}.tmp"
+    quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, output_path)
+    print("✅ ONNX模型量化完成")
+
+
+def load_encoder(backend: str, model_path: str, max_length: int = 512, num_threads: int = 0):
+    """按后端名称创建编码器（num_threads为0时线程数由运行时决定）"""
+    if backend == "torch":
+        return TorchEncoder(model_path, max_length=max_length, num_threads=num_threads)
+    if backend == "onnx":
+        return OnnxEncoder(model_path, quantize=False, max_length=max_length, num_threads=num_threads)
+    if backend == "onnx-int8":
+        return OnnxEncoder(model_path, quantize=True, max_length=max_length, num_threads=num_threads)
+    raise ValueError(f"不支持的编码器后端: {backend}（可选: {', '.join(BACKENDS)}）")
@@ -3,14 +3,21 @@
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+import os
+import time
 import uvicorn
 import logging
 import json
 from datetime import datetime
-import requests
+from typing import AsyncIterator
+from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
+
+from .llm_client import create_client, format_sse, LLM_FIRST_TOKEN_SECONDS, LLM_STREAM_SECONDS
+from .single_flight import SingleFlight
+from .tracing import span
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -46,25 +53,56 @@ class ChatResponse(BaseModel):
 
 # ==================== AI模型配置 ====================
 
-# 选择你的模型类型（修改这里）
-MODEL_TYPE = "openai"  # 可选: openai, deepseek, zhipu, local
+# 选择你的模型类型（修改这里，或设置环境变量 MODEL_TYPE）
+MODEL_TYPE = os.getenv("MODEL_TYPE", "openai")  # 可选: openai, deepseek, local
 
-# 配置你的API密钥（这里填入你的密钥）
+# 配置你的API密钥（这里填入你的密钥，或通过环境变量设置）
 MODEL_CONFIG = {
     "openai": {
-        "api_key": "sk-your-openai-key-here",
-        "base_url": "https://api.openai.com/v1",
-        "model": "gpt-3.5-turbo"
+        "api_key": os.getenv("OPENAI_API_KEY", "sk-your-openai-key-here"),
+        "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        "model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     },
     "deepseek": {
-        "api_key": "sk-your-deepseek-key-here",
-        "base_url": "https://api.deepseek.com",
-        "model": "deepseek-chat"
+        "api_key": os.getenv("DEEPSEEK_API_KEY", "sk-your-deepseek-key-here"),
+        "base_url": os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+        "model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+    },
+    "local": {
+        # 假设本地模型运行在7860端口
+        "url": os.getenv("LOCAL_MODEL_URL", "http://localhost:7860/chat")
     },
     # 添加其他模型配置
 }
 
-def call_ai_model(question: str, context: str = "") -> str:
+# 共享的异步连接池客户端：长连接复用、超时和重试见 src/llm_client.py
+llm_client = create_client()
+
+LLM_CALLS = Counter(
+    'llm_calls_total',
+    '非流式大模型调用次数，deduplicated="true" 表示与进行中的相同请求合并、未发往上游',
+    ['model', 'deduplicated']
+)
+
+# 相同问题（规范化后）+ 相同检索上下文的并发请求共享一次上游调用
+single_flight = SingleFlight(
+    on_call=lambda deduplicated: LLM_CALLS.labels(model=MODEL_TYPE, deduplicated=str(deduplicated).lower()).inc()
+)
+
+def build_messages(question: str, context: str = ""):
+    """按模型类型组装对话消息，返回 (messages, max_tokens)"""
+    if MODEL_TYPE == "openai":
+        messages = [
+            {"role": "system", "content": "你是专业的智能客服助手，请友好、准确地回答用户问题。"},
+            {"role": "user", "content": f"{context}\n\n问题：{question}" if context else question}
+        ]
+        return messages, 1000
+    messages = [
+        {"role": "user", "content": question}
+    ]
+    return messages, 2000
+
+async def call_ai_model(question: str, context: str = "") -> str:
     """
     调用AI模型生成回答
     
@@ -76,66 +114,66 @@ def call_ai_model(question: str, context: str = "") -> str:
         AI生成的回答
     """
     try:
-        if MODEL_TYPE == "openai":
-            import openai
-            openai.api_key = MODEL_CONFIG["openai"]["api_key"]
-            openai.base_url = MODEL_CONFIG["openai"]["base_url"]
-            
-            messages = [
-                {"role": "system", "content": "你是专业的智能客服助手，请友好、准确地回答用户问题。"},
-                {"role": "user", "content": f"{context}\n\n问题：{question}" if context else question}
-            ]
-            
-            response = openai.chat.completions.create(
-                model=MODEL_CONFIG["openai"]["model"],
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
-            return response.choices[0].message.content
-            
-        elif MODEL_TYPE == "deepseek":
-            headers = {
-                "Authorization": f"Bearer {MODEL_CONFIG['deepseek']['api_key']}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": MODEL_CONFIG["deepseek"]["model"],
-                "messages": [
-                    {"role": "user", "content": question}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 2000
-            }
-            
-            response = requests.post(
-                f"{MODEL_CONFIG['deepseek']['base_url']}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
-            
-        elif MODEL_TYPE == "local":
-            # 假设本地模型运行在7860端口
-            response = requests.post(
-                "http://localhost:7860/chat",
-                json={"question": question},
-                timeout=120
-            )
-            return response.json().get("answer", "未收到回答")
-            
-        else:
-            return f"未知的模型类型: {MODEL_TYPE}"
-            
+        key = SingleFlight.make_key(MODEL_TYPE, question, context)
+        with span("generate"):
+            return await single_flight.do(key, lambda: request_ai_model(question, context))
     except Exception as e:
         logger.error(f"AI模型调用失败: {e}")
         return f"抱歉，暂时无法处理您的问题。错误信息：{str(e)}"
 
+async def request_ai_model(question: str, context: str = "") -> str:
+    """向上游发送一次模型调用（由 call_ai_model 经请求合并后调用）"""
+    if MODEL_TYPE in ("openai", "deepseek"):
+        # 两者都是OpenAI兼容接口
+        model_config = MODEL_CONFIG[MODEL_TYPE]
+        messages, max_tokens = build_messages(question, context)
+        return await llm_client.chat(
+            model_config["base_url"],
+            model_config["api_key"],
+            model_config["model"],
+            messages,
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        
+    elif MODEL_TYPE == "local":
+        result = await llm_client.post_json(
+            MODEL_CONFIG["local"]["url"],
+            {"question": question},
+            timeout=120
+        )
+        return result.get("answer", "未收到回答")
+        
+    else:
+        return f"未知的模型类型: {MODEL_TYPE}"
+
+async def stream_ai_model(question: str, context: str = "") -> AsyncIterator[str]:
+    """流式调用AI模型，逐段产出回答；本地模型不支持流式，整段返回"""
+    if MODEL_TYPE in ("openai", "deepseek"):
+        model_config = MODEL_CONFIG[MODEL_TYPE]
+        messages, max_tokens = build_messages(question, context)
+        async for chunk in llm_client.stream_chat(
+            model_config["base_url"],
+            model_config["api_key"],
+            model_config["model"],
+            messages,
+            temperature=0.7,
+            max_tokens=max_tokens
+        ):
+            yield chunk
+    elif MODEL_TYPE == "local":
+        result = await llm_client.post_json(MODEL_CONFIG["local"]["url"], {"question": question}, timeout=120)
+        yield result.get("answer", "未收到回答")
+    else:
+        raise ValueError(f"未知的模型类型: {MODEL_TYPE}")
+
 # ==================== API端点 ====================
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭大模型客户端的连接池"""
+    await llm_client.aclose()
+
 @app.get("/")
 async def root():
     """首页"""
@@ -144,7 +182,11 @@ async def root():
 @app.get("/health")
 async def health_check():
     """健康检查"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "single_flight": single_flight.stats()
+    }
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
@@ -159,7 +201,7 @@ async def chat_endpoint(request: ChatRequest):
             context = retrieve_from_vector_db(request.question)
         
         # 调用AI模型
-        answer = call_ai_model(request.question, context)
+        answer = await call_ai_model(request.question, context)
         
         logger.info(f"问题处理完成")
         
@@ -174,6 +216,49 @@ async def chat_endpoint(request: ChatRequest):
         logger.error(f"处理问题时出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    流式聊天接口：以Server-Sent Events逐段转发大模型的输出
+
+    事件格式：
+        data: {"token": "..."}                         回答片段
+        data: {"done": true, "first_token_ms": ...}    结束
+        event: error / data: {"error": "..."}          出错
+    """
+    logger.info(f"收到流式问题: {request.question}")
+    context = retrieve_from_vector_db(request.question) if request.use_rag else ""
+    
+    async def events():
+        start = time.perf_counter()
+        first_token = None
+        try:
+            async for chunk in stream_ai_model(request.question, context):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    LLM_FIRST_TOKEN_SECONDS.labels(model=MODEL_TYPE).observe(first_token)
+                yield format_sse({"token": chunk})
+            total = time.perf_counter() - start
+            LLM_STREAM_SECONDS.labels(model=MODEL_TYPE).observe(total)
+            yield format_sse({
+                "done": True,
+                "model": MODEL_TYPE,
+                "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                "total_ms": round(total * 1000, 1)
+            })
+        except Exception as e:
+            logger.error(f"流式生成失败: {e}")
+            yield format_sse({"error": f"抱歉，暂时无法处理您的问题。错误信息：{str(e)}"}, event="error")
+    
+    # X-Accel-Buffering 关闭Nginx对本响应的缓冲，保证token及时送达浏览器
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus指标"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 def retrieve_from_vector_db(question: str) -> str:
     """从向量数据库检索相关文档"""
     # 这里可以集成ChromaDB
@@ -187,6 +272,7 @@ if __name__ == "__main__":
     logger.info(f"📍 服务地址: http://localhost:8000")
     logger.info(f"📚 API文档: http://localhost:8000/docs")
     logger.info(f"💬 聊天接口: http://localhost:8000/api/chat")
+    logger.info(f"🌊 流式接口: http://localhost:8000/api/chat/stream")
     logger.info(f"🤖 使用模型: {MODEL_TYPE}")
     logger.info("⏹️  按 Ctrl+C 停止服务")
     print("-"*50)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+推理执行器 - 把阻塞的模型推理和向量检索移出asyncio事件循环
+功能：固定大小的线程池 + 有界等待队列，队列满时立即拒绝（由接口返回503）
+"""
+
+import asyncio
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class ExecutorBusyError(Exception):
+    """推理队列已满"""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int = 4, max_queue: int = 64):
+        """
+        初始化推理执行器
+
+        Args:
+            max_workers: 同时执行推理的线程数
+            max_queue: 排队等待的最大任务数，超出后拒绝新任务
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        # 执行中 + 排队中的任务总数上限
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """执行中和排队中的任务数"""
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在线程池中执行阻塞函数并等待结果
+
+        Raises:
+            ExecutorBusyError: 执行中和排队中的任务已达上限
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError(f"推理队列已满（{self.max_workers}个执行中，{self.max_queue}个排队）")
+        with self._lock:
+            self._pending += 1
+
+        # 名额在线程池任务真正结束时才归还，即使调用方被取消也不会超额接收任务
+        # 在调用方上下文的副本中执行，请求级的上下文变量（如耗时追踪）在线程中依然可见
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+并行建索引 - 多进程切分和生成嵌入，单进程写入向量数据库
+流程：
+    主进程     列出文件，按文件分发给进程池；作为唯一的写入者批量写入集合
+    工作进程   读取并切分一个文件，为库中没有的块生成嵌入，把结果交回主进程
+
+每个工作进程固定模型的算子内线程数（--threads-per-worker），
+工作进程数 × 每进程线程数 不应超过机器核数，否则线程互相争抢反而变慢。
+结束时按阶段报告吞吐（切分 / 嵌入 / 写入）。
+
+用法:
+    python -m src.ingest --source data/ --workers 8 --threads-per-worker 4
+"""
+
+import os
+import time
+import argparse
+import multiprocessing
+from typing import List, Optional, Set
+
+from config import config
+from .document_processor import DocumentProcessor
+from .encoders import load_encoder, parse_model_spec
+from .vector_search import VectorSearch, make_chunk_id, encode_sorted
+
+# 工作进程内的状态（由 _init_worker 初始化）
+_worker = {}
+
+
+def _init_worker(model_spec: str, num_threads: int, batch_size: int,
+                 chunk_size: int, chunk_overlap: int, existing_ids: Set[str]):
+    """工作进程初始化：固定线程数并加载模型"""
+    # 线程数需要在加载torch/tokenizers之前确定
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    backend, model_path = parse_model_spec(model_spec)
+    encoder = load_encoder(backend, model_path, num_threads=num_threads)
+    _worker.update(
+        encoder=encoder,
+        model_id=model_path if backend == "torch" else f"{backend}:{model_path}",
+        batch_size=batch_size,
+        processor=DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                    tokenizer=encoder.tokenizer),
+        existing_ids=existing_ids,
+    )
+
+
+def _process_file(path: str) -> dict:
+    """切分一个文件并为新块生成嵌入（在工作进程中执行）"""
+    start = time.perf_counter()
+    chunks = list(_worker["processor"].iter_chunks(path))
+    ids = [make_chunk_id(_worker["model_id"], chunk) for chunk in chunks]
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = [i for i, chunk_id in enumerate(ids) if chunk_id not in _worker["existing_ids"]]
+    embeddings = encode_sorted(_worker["encoder"], [chunks[i] for i in new], _worker["batch_size"])
+    embed_seconds = time.perf_counter() - start
+
+    return {
+        "ids": ids,
+        "chunks": chunks,
+        "new": new,
+        "embeddings": embeddings,
+        "chunk_seconds": chunk_seconds,
+        "embed_seconds": embed_seconds,
+    }
+
+
+def ingest(source: str, persist_directory: str, model_spec: str, workers: int, threads_per_worker: int,
+           batch_size: int = 32, chunk_size: int = 300, chunk_overlap: int = 0,
+           index_backend: str = "chroma", extensions: tuple = (".txt", ".md")) -> dict:
+    """
+    并行同步 source 下的全部文档到向量数据库，返回各阶段统计
+    """
+    wall_start = time.perf_counter()
+    # 写入进程不需要模型
+    writer = VectorSearch(persist_directory=persist_directory, model_path=model_spec,
+                          index_backend=index_backend, load_model=False)
+    existing_ids = writer.existing_ids()
+    files = list(DocumentProcessor(extensions=extensions).iter_files(source))
+    # 大文件先分发，减少最后只剩一个进程在处理大文件的长尾
+    files.sort(key=os.path.getsize, reverse=True)
+    print(f"📂 共 {len(files)} 个文件，{workers} 个工作进程 × {threads_per_worker} 线程，"
+          f"库中已有 {len(existing_ids)} 个文本块")
+
+    totals = {"files": 0, "chunks": 0, "embedded": 0, "chunk_seconds": 0.0, "embed_seconds": 0.0}
+
+    def records(results):
+        for result in results:
+            totals["files"] += 1
+            totals["chunks"] += len(result["chunks"])
+            totals["embedded"] += len(result["new"])
+            totals["chunk_seconds"] += result["chunk_seconds"]
+            totals["embed_seconds"] += result["embed_seconds"]
+            embeddings: List[Optional[object]] = [None] * len(result["chunks"])
+            for i, embedding in zip(result["new"], result["embeddings"]):
+                embeddings[i] = embedding
+            yield from zip(result["ids"], result["chunks"], embeddings)
+
+    # spawn：工作进程不继承主进程的线程和数据库连接
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(model_spec, threads_per_worker, batch_size, chunk_size, chunk_overlap, existing_ids),
+    ) as pool:
+        sync_stats = writer.add_embedded_stream(records(pool.imap_unordered(_process_file, files)))
+
+    wall_seconds = time.perf_counter() - wall_start
+    return {**totals, **sync_stats, "workers": workers, "wall_seconds": wall_seconds}
+
+
+def report(stats: dict):
+    """打印各阶段吞吐：单进程速率 = 数量 / 该阶段累计耗时，整体速率再乘以进程数"""
+    def rate(count, seconds):
+        return count / seconds if seconds > 0 else 0.0
+
+    workers = stats["workers"]
+    chunk_rate = rate(stats["files"], stats["chunk_seconds"])
+    embed_rate = rate(stats["embedded"], stats["embed_seconds"])
+    write_rate = rate(stats["new"], stats["write_seconds"])
+
+    print(f"\n=== 建索引统计（{workers} 个工作进程）===")
+    print(f"{'阶段':8s} {'数量':>10s} {'累计耗时(s)':>12s} {'单进程(/s)':>12s} {'整体(/s)':>12s}")
+    print(f"{'切分':8s} {stats['files']:10d} {stats['chunk_seconds']:12.2f} {chunk_rate:12.2f} "
+          f"{chunk_rate * workers:12.2f}  (文件)")
+    print(f"{'嵌入':8s} {stats['embedded']:10d} {stats['embed_seconds']:12.2f} {embed_rate:12.2f} "
+          f"{embed_rate * workers:12.2f}  (文本块)")
+    print(f"{'写入':8s} {stats['new']:10d} {stats['write_seconds']:12.2f} {write_rate:12.2f} "
+          f"{write_rate:12.2f}  (文本块，单写入进程)")
+    print(f"总耗时 {stats['wall_seconds']:.2f}s：{rate(stats['files'], stats['wall_seconds']):.2f} 文件/s，"
+          f"{rate(stats['chunks'], stats['wall_seconds']):.2f} 文本块/s；"
+          f"新增 {stats['new']}，删除 {stats['removed']}，未变化 {stats['unchanged']}")
+
+
+if __name__ == "__main__":
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="并行建索引")
+    parser.add_argument("--source", default=config.KNOWLEDGE_PATH, help="文档文件或目录")
+    parser.add_argument("--persist-directory", default=config.VECTOR_DB_PATH)
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL, help="嵌入模型，格式为 [后端:]模型路径")
+    parser.add_argument("--index-backend", default=config.VECTOR_INDEX_BACKEND, choices=["chroma", "numpy"])
+    parser.add_argument("--workers", type=int, default=max(1, cpu_count // 4))
+    parser.add_argument("--threads-per-worker", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=config.CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=config.CHUNK_OVERLAP)
+    args = parser.parse_args()
+
+    if args.workers * args.threads_per_worker > cpu_count:
+        print(f"⚠️  {args.workers} 进程 × {args.threads_per_worker} 线程 超过CPU核数 {cpu_count}")
+
+    report(ingest(
+        source=args.source,
+        persist_directory=args.persist_directory,
+        model_spec=args.model,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        index_backend=args.index_backend,
+    ))
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+大模型调用客户端 - 各AI代理服务共用的异步HTTP客户端
+功能：
+    连接池      每个目标主机一个 httpx.AsyncClient，长连接复用，省去每次请求的TCP/TLS握手
+    HTTP/2      安装了 h2 时启用，同一连接上多路复用并发请求
+    连接数限制  每个主机的最大连接数和保持的空闲连接数可配置
+    超时        连接、读取、写入、从连接池取连接分别设置超时
+    重试        网络错误和 429/5xx 按带随机抖动的指数退避重试（遵守 Retry-After）
+    流式输出    stream_chat 逐段产出大模型生成的文本（解析上游的SSE），只在收到首个数据之前重试
+    流式指标    LLM_FIRST_TOKEN_SECONDS / LLM_STREAM_SECONDS 由各服务的流式接口上报
+
+异步代码直接使用 LLMClient；Flask等同步代码使用 SyncLLMClient，
+它在后台线程中运行一个事件循环，所有请求共享同一组连接池。
+"""
+
+import json
+import queue
+import asyncio
+import random
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from prometheus_client import Histogram
+
+try:
+    import h2  # noqa: F401  httpx的HTTP/2支持依赖h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from config import config
+
+# 流式输出指标：首个token的等待时间是用户感知延迟的主要部分，单独统计（各服务共用，避免重复注册）
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    'llm_first_token_seconds',
+    '从收到请求到产出首个token的时间',
+    ['model'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+LLM_STREAM_SECONDS = Histogram(
+    'llm_stream_duration_seconds',
+    '流式回答的总耗时',
+    ['model'],
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120)
+)
+
+# 这些状态码表示服务端暂时不可用，可以重试
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """大模型调用失败（重试耗尽或返回了不可重试的错误）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+def _chat_payload(model: str, messages: List[dict], temperature: float,
+                  max_tokens: Optional[int], stream: bool) -> dict:
+    """/chat/completions 请求体，max_tokens为None时不发送该字段"""
+    payload = {"model": model, "messages": messages, "temperature": temperature, "stream": stream}
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    return payload
+
+
+class LLMClient:
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, keepalive_expiry: float = 30,
+                 connect_timeout: float = 5, read_timeout: float = 60, pool_timeout: float = 5,
+                 retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8, http2: bool = True,
+                 verify: bool = True):
+        """
+        初始化客户端
+
+        Args:
+            max_connections: 每个主机的最大连接数
+            max_keepalive: 每个主机保持的空闲长连接数
+            keepalive_expiry: 空闲连接保留的秒数
+            connect_timeout: 建立连接（含TLS握手）的超时
+            read_timeout: 等待响应数据的超时（大模型生成较慢，需要给足）
+            pool_timeout: 连接池满时等待空闲连接的超时
+            retries: 失败后的最大重试次数
+            backoff_base: 退避基数（秒），第n次重试最多等待 base * 2^n 秒
+            backoff_max: 单次退避的最大等待时间（秒）
+            http2: 是否启用HTTP/2（需要安装h2）
+            verify: 是否校验HTTPS证书
+        """
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.verify = verify
+        # 按主机（scheme://host:port）划分连接池，互不抢占连接数
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _client_for(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2,
+                                       verify=self.verify)
+            self._clients[origin] = client
+        return client
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """计算第 attempt 次重试前的等待时间：全抖动指数退避，服务端给出 Retry-After 时取其值"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def post_json(self, url: str, payload: dict, headers: Optional[dict] = None,
+                        timeout: Optional[float] = None) -> dict:
+        """发送JSON POST请求并返回JSON响应，按配置重试"""
+        client = self._client_for(url)
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = await client.post(url, json=payload, headers=headers,
+                                             timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+            except httpx.TransportError as e:
+                # 连接失败、超时、连接被重置等网络错误
+                if last_attempt:
+                    raise LLMError(f"请求失败: {type(e).__name__}: {e}") from e
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                await asyncio.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+                continue
+            if response.status_code != 200:
+                raise LLMError(f"API调用失败: {response.status_code} - {response.text}",
+                               status_code=response.status_code, body=response.text)
+            return response.json()
+
+    async def chat(self, base_url: str, api_key: str, model: str, messages: List[dict],
+                   temperature: float = 0.7, max_tokens: Optional[int] = 1000, timeout: Optional[float] = None) -> str:
+        """调用OpenAI兼容的 /chat/completions 接口，返回回答文本（max_tokens为None时不限制，由上游决定）"""
+        result = await self.post_json(
+            f"{base_url.rstrip('/')}/chat/completions",
+            _chat_payload(model, messages, temperature, max_tokens, stream=False),
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout
+        )
+        return result["choices"][0]["message"]["content"]
+
+    async def stream_chat(self, base_url: str, api_key: str, model: str, messages: List[dict],
+                          temperature: float = 0.7, max_tokens: Optional[int] = 1000,
+                          timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        流式调用OpenAI兼容的 /chat/completions 接口，逐段产出生成的文本
+
+        上游以SSE返回，每个事件为 data: {"choices": [{"delta": {"content": ...}}]}，以 data: [DONE] 结束。
+        已经产出过文本后不再重试（否则调用方会收到重复内容）
+        """
+        url = f"{base_url.rstrip('/')}/chat/completions"
+        client = self._client_for(url)
+        payload = _chat_payload(model, messages, temperature, max_tokens, stream=True)
+        headers = {"Authorization": f"Bearer {api_key}", "Accept": "text/event-stream"}
+        started = False
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            retry_after = None
+            try:
+                async with client.stream("POST", url, json=payload, headers=headers,
+                                         timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT) as response:
+                    if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                        retry_after = response.headers.get("Retry-After")
+                    elif response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", errors="replace")
+                        raise LLMError(f"API调用失败: {response.status_code} - {body}",
+                                       status_code=response.status_code, body=body)
+                    else:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                return
+                            choices = json.loads(data).get("choices") or [{}]
+                            content = (choices[0].get("delta") or {}).get("content")
+                            if content:
+                                started = True
+                                yield content
+                        return
+            except httpx.TransportError as e:
+                if started or last_attempt:
+                    raise LLMError(f"请求失败: {type(e).__name__}: {e}") from e
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def stats(self) -> Dict[str, object]:
+        """各主机的连接池配置"""
+        return {"hosts": list(self._clients), "http2": self.http2,
+                "max_connections": self.limits.max_connections}
+
+    async def aclose(self):
+        """关闭全部连接"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+class SyncLLMClient:
+    """同步包装：在后台线程的事件循环中执行 LLMClient 的请求，供Flask等同步代码调用"""
+
+    def __init__(self, client: Optional[LLMClient] = None):
+        self.client = client or create_client()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def post_json(self, url: str, payload: dict, headers: Optional[dict] = None,
+                  timeout: Optional[float] = None) -> dict:
+        return self._run(self.client.post_json(url, payload, headers=headers, timeout=timeout))
+
+    def chat(self, base_url: str, api_key: str, model: str, messages: List[dict],
+             temperature: float = 0.7, max_tokens: Optional[int] = 1000, timeout: Optional[float] = None) -> str:
+        return self._run(self.client.chat(base_url, api_key, model, messages,
+                                          temperature=temperature, max_tokens=max_tokens, timeout=timeout))
+
+    def stream_chat(self, base_url: str, api_key: str, model: str, messages: List[dict],
+                    temperature: float = 0.7, max_tokens: Optional[int] = 1000,
+                    timeout: Optional[float] = None) -> Iterator[str]:
+        """流式调用的同步版本：后台事件循环接收上游数据，通过队列逐段交给调用线程"""
+        chunks: "queue.Queue" = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for chunk in self.client.stream_chat(base_url, api_key, model, messages,
+                                                           temperature=temperature, max_tokens=max_tokens,
+                                                           timeout=timeout):
+                    chunks.put(chunk)
+            except BaseException as e:
+                chunks.put(e)
+            finally:
+                chunks.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # 调用方提前停止读取（如浏览器断开）时取消上游请求
+            future.cancel()
+
+    def close(self):
+        self._run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """格式化一个Server-Sent Events事件"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def create_client() -> LLMClient:
+    """按全局配置创建客户端"""
+    return LLMClient(
+        max_connections=config.LLM_MAX_CONNECTIONS,
+        max_keepalive=config.LLM_MAX_KEEPALIVE,
+        connect_timeout=config.LLM_CONNECT_TIMEOUT,
+        read_timeout=config.LLM_READ_TIMEOUT,
+        retries=config.LLM_RETRIES,
+        http2=config.LLM_HTTP2
+    )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+prefork 多进程服务 - 多个worker共享同一份模型权重和向量索引内存
+流程：
+    主进程   加载嵌入模型，以内存映射只读打开NumPy索引（向量矩阵、ID和文本都是mmap文件），
+             创建监听socket，然后fork出多个worker，并在worker异常退出时重新拉起
+    worker   继承模型和索引，在共享的socket上运行uvicorn，启动后各自预热
+
+与 uvicorn --workers N 的区别：后者每个worker各自导入并加载模型、打开数据库，内存随worker数线性增长；
+这里模型权重在fork前加载，worker以写时复制方式共享这些页面，
+索引文件的页面由内核页缓存在所有进程间共享。
+
+内存说明：
+    RSS 会把共享页面重复计入每个进程，判断实际占用应看 PSS（共享页面按共享进程数均摊）。
+    用 python measure_worker_memory.py --mode prefork --workers 4
+    和 python measure_worker_memory.py --mode uvicorn --workers 4 对比每个worker的 PSS / Private。
+    每个worker私有的部分主要是：预热后的推理中间张量、查询缓存、
+    混合检索模式下的BM25倒排表（在各worker内单独构建）。
+
+    实测（4 个worker，每种模式各发送200次 /ask 后读取，单位MB）：
+                          每worker PSS   每worker Private   全部进程PSS合计
+        prefork                65.3            26.1              340.1（含主进程 78.9）
+        uvicorn --workers     222.2           210.5              912.5（含主进程和resource_tracker 23.8）
+    测量环境：1核CPU，onnx 后端（未安装torch），模型为与 bge-small-zh 同规格的随机权重ONNX模型
+    （hidden 512、4层、词表21128，fp32权重约90MB），numpy 索引 437 个文本块。
+    uvicorn 模式下每个worker各有一份完整的模型权重（Private约210MB）；prefork 模式下权重留在共享页面中，
+    worker私有的只有推理中间结果和各自的缓存。torch 后端和真实模型的绝对值会不同，应在目标机器上重新测量。
+
+前提：索引使用 numpy 后端，并已由 python -m src.ingest --index-backend numpy 构建在 VECTOR_DB_PATH 下。
+prefork 模式下不支持 /admin/reload，重建索引后重启服务即可。
+
+用法:
+    python -m src.prefork --workers 4 --threads-per-worker 2 --port 8000
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+
+import uvicorn
+
+from config import config
+from . import api_service
+
+
+def run_worker(sock: socket.socket, worker_index: int, threads: int):
+    """worker进程：在继承的socket上运行uvicorn"""
+    # 恢复默认信号处理，由uvicorn接管
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if api_service.preloaded_search.backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+
+    server = uvicorn.Server(uvicorn.Config(api_service.app, log_level="info"))
+    print(f"👷 worker {worker_index} 已启动（pid={os.getpid()}）")
+    server.run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, threads: int):
+    """主进程：加载模型和索引、fork worker并监管"""
+    # tokenizers 的Rust线程池在fork后不可用，关闭其并行
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if config.VECTOR_INDEX_BACKEND != "numpy":
+        print(f"⚠️  prefork 模式使用 numpy 索引（当前配置为 {config.VECTOR_INDEX_BACKEND}），"
+              f"读取 {config.VECTOR_DB_PATH}")
+
+    start = time.perf_counter()
+    search = api_service.preload_system(num_threads=threads)
+    print(f"✅ 模型和索引已加载（{search.collection.count()} 个文本块，耗时 {time.perf_counter() - start:.1f}s）")
+    # 把已有对象移出GC追踪，避免worker里的垃圾回收改写对象头、触发大量写时复制
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = {}
+    stopping = False
+
+    def spawn(worker_index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, worker_index, threads)
+            except BaseException as e:
+                print(f"❌ worker {worker_index} 异常退出: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = worker_index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker_index in range(workers):
+        spawn(worker_index)
+    print(f"🚀 prefork 服务已启动: http://{host}:{port}（{workers} 个worker × {threads} 线程，主进程pid={os.getpid()}）")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_index = children.pop(pid, None)
+        if worker_index is None or stopping:
+            continue
+        print(f"⚠️  worker {worker_index}（pid={pid}）退出，状态码 {os.waitstatus_to_exitcode(status)}，1秒后重启")
+        time.sleep(1)
+        spawn(worker_index)
+
+    sock.close()
+    print("🛑 prefork 服务已停止")
+
+
+if __name__ == "__main__":
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="prefork 多进程服务")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--workers", type=int, default=config.PREFORK_WORKERS)
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="每个worker的推理线程数，默认 CPU核数 / worker数")
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, cpu_count // args.workers)
+    if sys.platform == "win32":
+        raise SystemExit("prefork 模式依赖 os.fork，不支持Windows")
+    serve(args.host, args.port, args.workers, threads)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+采样分析器 - 在服务进程内统计CPU时间花在哪里，不需要外部工具（如py-spy）
+原理：后台线程按固定频率调用 sys._current_frames() 抓取所有线程的调用栈并计数，
+      不设置trace/profile钩子，被分析的代码没有额外开销，开销只与采样频率和线程数有关。
+      这是墙钟采样：等待锁、IO、队列的线程同样会被采到，可按线程名区分。
+
+两种用法：
+    profile(seconds)      一次性采样N秒，返回结果
+    ContinuousProfiler    持续低频采样，按时间片保存最近一段时间的调用栈，随时导出滚动火焰图
+
+输出格式：
+    collapsed     每行 "线程;外层函数;...;内层函数 次数"，可直接交给 flamegraph.pl / speedscope
+    speedscope    https://www.speedscope.app 的JSON格式，每个线程一个profile
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+from typing import Dict, Iterable, Optional, Tuple
+
+Stack = Tuple[str, ...]
+
+FORMATS = ("collapsed", "speedscope")
+
+
+def _frame_name(code) -> str:
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(skip_thread: Optional[int] = None) -> Iterable[Stack]:
+    """抓取一次所有线程的调用栈，每个栈以线程名开头、从外层到内层排列"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == skip_thread:
+            continue
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        stack.append(names.get(thread_id, f"thread-{thread_id}"))
+        stack.reverse()
+        yield tuple(stack)
+
+
+def to_collapsed(counts: Counter) -> str:
+    """折叠栈格式"""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in counts.most_common())
+
+
+def to_speedscope(counts: Counter, interval: float, name: str = "smart-customer-service") -> dict:
+    """speedscope格式：权重为 采样次数 × 采样间隔（秒）"""
+    frames: Dict[str, int] = {}
+    profiles: Dict[str, dict] = {}
+    for stack, count in counts.items():
+        thread, calls = stack[0], stack[1:]
+        profile = profiles.setdefault(thread, {
+            "type": "sampled", "name": thread, "unit": "seconds",
+            "startValue": 0, "endValue": 0, "samples": [], "weights": []
+        })
+        profile["samples"].append([frames.setdefault(call, len(frames)) for call in calls])
+        weight = count * interval
+        profile["weights"].append(weight)
+        profile["endValue"] += weight
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "src.profiler",
+        "shared": {"frames": [{"name": frame} for frame in frames]},
+        "profiles": list(profiles.values())
+    }
+
+
+def export(counts: Counter, interval: float, fmt: str):
+    if fmt == "collapsed":
+        return to_collapsed(counts)
+    if fmt == "speedscope":
+        return to_speedscope(counts, interval)
+    raise ValueError(f"不支持的输出格式: {fmt}（可选: {', '.join(FORMATS)}）")
+
+
+_profile_lock = threading.Lock()
+
+
+def profile(seconds: float, hz: float = 100) -> Counter:
+    """
+    在调用线程中采样 seconds 秒（阻塞），返回 调用栈 -> 采样次数
+
+    同一时刻只允许一次采样，已有采样在进行时抛出 RuntimeError
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("已有采样在进行中")
+    try:
+        counts: Counter = Counter()
+        interval = 1.0 / hz
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            counts.update(sample_stacks(skip_thread=me))
+            next_sample += interval
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+        return counts
+    finally:
+        _profile_lock.release()
+
+
+class ContinuousProfiler:
+    def __init__(self, hz: float = 5, window_seconds: float = 600, bucket_seconds: float = 10):
+        """
+        初始化持续采样器
+
+        Args:
+            hz: 采样频率（每秒次数），常驻运行时应保持较低
+            window_seconds: 保留最近多少秒的采样
+            bucket_seconds: 按多长的时间片聚合，过期的时间片整体丢弃
+        """
+        if hz <= 0:
+            raise ValueError(f"采样频率必须大于0: hz={hz}（关闭持续采样请设置 PROFILER_HZ=0 或 PROFILER_CONTINUOUS=false）")
+        self.interval = 1.0 / hz
+        self.hz = hz
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        # (时间片开始时间, 调用栈计数)
+        self._buckets: "deque[Tuple[float, Counter]]" = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台采样线程"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="continuous-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采样（已采集的数据保留）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = list(sample_stacks(skip_thread=me))
+            now = time.monotonic()
+            with self._lock:
+                if not self._buckets or now - self._buckets[-1][0] >= self.bucket_seconds:
+                    self._buckets.append((now, Counter()))
+                self._buckets[-1][1].update(stacks)
+                while self._buckets and now - self._buckets[0][0] > self.window_seconds:
+                    self._buckets.popleft()
+
+    def snapshot(self, seconds: Optional[float] = None) -> Counter:
+        """合并最近 seconds 秒（默认整个窗口）的采样"""
+        since = time.monotonic() - (seconds if seconds is not None else self.window_seconds)
+        counts: Counter = Counter()
+        with self._lock:
+            for start, bucket in self._buckets:
+                if start + self.bucket_seconds >= since:
+                    counts.update(bucket)
+        return counts
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            covered = time.monotonic() - self._buckets[0][0] if self._buckets else 0.0
+        return {"running": self.running, "hz": self.hz, "window_seconds": self.window_seconds,
+                "covered_seconds": round(covered, 1)}
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+查询嵌入缓存 - 进程内的LRU + TTL缓存
+功能：高频重复问题（如"退货需要几天"）直接复用已计算的查询向量，跳过模型推理
+"""
+
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 句末标点不影响语义，规范化时去掉
+_TRAILING_PUNCTUATION = re.compile(r"[\s?？!！。.,，~～]+$")
+
+
+class QueryEmbeddingCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600,
+                 on_lookup: Optional[Callable[[bool], None]] = None):
+        """
+        初始化查询嵌入缓存
+
+        Args:
+            maxsize: 最多缓存的查询数量，超出后淘汰最久未使用的
+            ttl: 缓存有效期（秒）
+            on_lookup: 每次查询缓存后的回调，参数为是否命中（用于上报监控指标）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_lookup = on_lookup
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """规范化查询文本：全半角统一、合并空白、去掉句末标点、英文小写"""
+        normalized = unicodedata.normalize("NFKC", " ".join(query.split()))
+        return _TRAILING_PUNCTUATION.sub("", normalized).lower()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """查询缓存，过期条目视为未命中"""
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        if self.on_lookup is not None:
+            self.on_lookup(entry is not None)
+        return entry[1] if entry is not None else None
+
+    def put(self, query: str, embedding: List[float]):
+        """写入缓存"""
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize
+        }
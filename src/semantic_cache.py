@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+语义结果缓存 - 相近问题直接复用检索结果和答案
+功能：新问题的向量与最近回答过的问题足够接近（余弦距离小于阈值）时，
+     跳过向量数据库检索和答案生成，直接返回缓存结果
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    def __init__(self, max_distance: float = 0.05, maxsize: int = 1000, ttl: float = 600):
+        """
+        初始化语义缓存
+
+        Args:
+            max_distance: 判定为同一问题的最大余弦距离
+            maxsize: 最多缓存的问题数量，超出后淘汰最早写入的；小于等于0时禁用缓存
+            ttl: 缓存有效期（秒）
+        """
+        self.max_distance = max_distance
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        # 已缓存问题的归一化向量索引：一行一个问题，查询时一次矩阵乘法算出全部余弦相似度。
+        # 缓存规模在几千条以内，精确检索比近似索引更快也更简单
+        self._vectors: Optional[np.ndarray] = None
+        self._created = np.zeros(self.maxsize, dtype=np.float64)
+        self._valid = np.zeros(self.maxsize, dtype=bool)
+        self._values: List[Optional[Dict[str, Any]]] = [None] * self.maxsize
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_version(self, version: int):
+        """知识库版本变化时清空缓存（调用方需持有锁）"""
+        if version != self._version:
+            self._valid[:] = False
+            self._values = [None] * self.maxsize
+            self._version = version
+
+    def lookup(self, embedding: List[float], version: int) -> Optional[Dict[str, Any]]:
+        """
+        查找语义相近的已缓存结果
+
+        Args:
+            embedding: 查询向量
+            version: 当前知识库版本，与缓存时的版本不同则视为失效
+        """
+        if not self.enabled:
+            return None
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None or not self._valid.any():
+                self.misses += 1
+                return None
+
+            # 过期条目不参与匹配
+            self._valid &= (time.monotonic() - self._created) <= self.ttl
+            similarities = self._vectors @ query
+            similarities[~self._valid] = -np.inf
+            best = int(np.argmax(similarities))
+
+            if self._valid[best] and 1.0 - similarities[best] <= self.max_distance:
+                self.hits += 1
+                return self._values[best]
+            self.misses += 1
+            return None
+
+    def store(self, embedding: List[float], value: Dict[str, Any], version: int):
+        """缓存一个问题的检索结果和答案（缓存禁用时不做任何事）"""
+        if not self.enabled:
+            return
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+
+            # 优先复用空槽位，否则淘汰最早写入的条目
+            free = np.flatnonzero(~self._valid)
+            slot = int(free[0]) if len(free) else int(np.argmin(self._created))
+
+            self._vectors[slot] = vector
+            self._created[slot] = time.monotonic()
+            self._valid[slot] = True
+            self._values[slot] = value
+
+    def invalidate(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._valid[:] = False
+            self._values = [None] * self.maxsize
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": int(self._valid.sum()),
+            "maxsize": self.maxsize
+        }
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+请求合并（single-flight）- 相同的大模型请求同一时刻只向上游发送一次
+功能：突发事件时大量用户同时问同一个问题，第一个请求发起上游调用，
+      其余相同键的并发请求等待并共享这次调用的结果（或异常）；调用结束后立即移除，不做缓存
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .query_cache import QueryEmbeddingCache
+
+
+class SingleFlight:
+    def __init__(self, on_call: Optional[Callable[[bool], None]] = None):
+        """
+        初始化请求合并器
+
+        Args:
+            on_call: 每次调用后的回调，参数为是否被合并（用于上报监控指标）
+        """
+        self.on_call = on_call
+        self.leaders = 0
+        self.deduplicated = 0
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+
+    @staticmethod
+    def make_key(model: str, prompt: str, context: str = "") -> str:
+        """由模型、规范化后的问题和检索上下文的哈希生成合并键"""
+        normalized = QueryEmbeddingCache.normalize(prompt)
+        context_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()
+        return hashlib.sha1(f"{model}\0{normalized}\0{context_hash}".encode("utf-8")).hexdigest()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 fn()；已有相同键的调用在进行中时直接等待它的结果
+
+        上游调用运行在独立的任务中，发起它的请求被取消（如客户端断开）时，
+        其他等待同一结果的请求不受影响
+        """
+        task = self._inflight.get(key)
+        deduplicated = task is not None
+        if deduplicated:
+            self.deduplicated += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        if self.on_call is not None:
+            self.on_call(deduplicated)
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都已取消时没有人读取异常，这里读取一次以免asyncio报告未处理的异常
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, float]:
+        """返回合并统计"""
+        total = self.leaders + self.deduplicated
+        return {
+            "upstream_calls": self.leaders,
+            "deduplicated": self.deduplicated,
+            "dedup_rate": round(self.deduplicated / total, 4) if total else 0.0,
+            "inflight": len(self._inflight)
+        }
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+系统资源采样器 - 后台定期采样CPU、内存、磁盘，请求路径只读取内存中的最新快照
+功能：健康检查和指标抓取不再阻塞事件循环（psutil.cpu_percent(interval=1) 会睡眠1秒），
+      也不再遍历整个内核socket表（psutil.net_connections()）
+"""
+
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import psutil
+
+
+class SystemMetricsSampler:
+    def __init__(self, interval: float = 5, disk_path: str = "/",
+                 on_sample: Optional[Callable[[Dict[str, object]], None]] = None):
+        """
+        初始化采样器
+
+        Args:
+            interval: 采样间隔（秒）
+            disk_path: 统计磁盘使用率的路径
+            on_sample: 每次采样后的回调，参数为新的快照（用于更新监控指标）
+        """
+        self.interval = interval
+        self.disk_path = disk_path
+        self.on_sample = on_sample
+        self.process = psutil.Process(os.getpid())
+        self._snapshot: Dict[str, object] = {}
+        self._task: Optional[asyncio.Task] = None
+        # cpu_percent(interval=None) 返回距上次调用的平均使用率，首次调用只建立基准
+        psutil.cpu_percent(interval=None)
+        self.process.cpu_percent(interval=None)
+
+    def sample(self) -> Dict[str, object]:
+        """采样一次并更新快照（每项都是非阻塞的读取，耗时在毫秒以内）"""
+        memory = self.process.memory_info()
+        snapshot = {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_usage": psutil.disk_usage(self.disk_path).percent,
+            "process_cpu_percent": self.process.cpu_percent(interval=None),
+            "process_rss_mb": round(memory.rss / 1024 / 1024, 1),
+            "process_threads": self.process.num_threads(),
+            "timestamp": datetime.now().isoformat(),
+            "sampled_at": time.monotonic()
+        }
+        self._snapshot = snapshot
+        if self.on_sample is not None:
+            self.on_sample(snapshot)
+        return snapshot
+
+    @property
+    def snapshot(self) -> Dict[str, object]:
+        """最近一次采样的结果（附带距今的秒数），尚未采样时立即采样一次"""
+        snapshot = dict(self._snapshot or self.sample())
+        snapshot["age_seconds"] = round(time.monotonic() - snapshot.pop("sampled_at"), 2)
+        return snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"⚠️  系统指标采样失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """在当前事件循环中启动后台采样任务"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止后台采样任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
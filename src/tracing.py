@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+分阶段耗时追踪 - 把一次问答拆成 嵌入 / 检索 / 生成 等阶段分别计时
+功能：
+    span(stage)      计时一个阶段，上报到 rag_stage_duration_seconds{stage=...} 直方图
+    start_trace()    为当前请求开启追踪，之后同一上下文中的span都会记入这次追踪的耗时明细，
+                     直方图的样本附带 trace_id 作为 exemplar（需以OpenMetrics格式抓取）
+
+阶段可以嵌套：embed（含缓存查询和微批等待）内部包含编码器的 tokenize 和 forward。
+
+当前追踪保存在 contextvars 中：asyncio任务自动继承；提交到线程池时需用
+contextvars.copy_context().run 包装，否则线程中的span只计入直方图、不进入追踪明细。
+"""
+
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import Histogram
+
+STAGE_LATENCY = Histogram(
+    'rag_stage_duration_seconds',
+    'RAG pipeline stage latency in seconds',
+    ['stage'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        # 阶段 -> 累计秒数（同一阶段出现多次时累加，如混合检索的两路查询）
+        self.timings: Dict[str, float] = {}
+        self.start = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def breakdown(self) -> Dict[str, float]:
+        """各阶段耗时（毫秒），total 为从开启追踪到现在的总耗时"""
+        result = {stage: round(seconds * 1000, 2) for stage, seconds in self.timings.items()}
+        result["total"] = round((time.perf_counter() - self.start) * 1000, 2)
+        return result
+
+
+def start_trace(trace_id: Optional[str] = None) -> Trace:
+    """在当前上下文开启一次追踪（每个请求的上下文相互独立）"""
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str):
+    """计时一个阶段：上报直方图，并记入当前追踪（如果有）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current_trace.get()
+        if trace is None:
+            STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        else:
+            trace.add(stage, elapsed)
+            STAGE_LATENCY.labels(stage=stage).observe(elapsed, exemplar={"trace_id": trace.trace_id})
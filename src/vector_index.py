@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+纯NumPy向量索引 - ChromaDB之外的轻量后端
+存储：归一化后的float32向量放在一个连续矩阵中，top-k用一次矩阵乘法 + argpartition求出
+持久化：向量存为 embeddings.npy，ID和文本各自存为一个UTF-8拼接文件加偏移数组，
+     三者都可以内存映射只读打开：多进程（如prefork的多个worker）共享同一份物理页
+
+实现了VectorSearch用到的ChromaDB集合接口子集（add / delete / get / query / count），
+可以直接替换 VectorSearch.collection。
+"""
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class StringBlob:
+    """
+    只读字符串数组：全部字符串UTF-8编码后拼接存放在一个文件中，另存一个偏移数组。
+    两个文件都以内存映射打开，按下标访问时才解码，不为每个字符串创建常驻的Python对象
+    """
+
+    def __init__(self, data_path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        # 空文件不能内存映射
+        if os.path.getsize(data_path) > 0:
+            self.data = np.memmap(data_path, dtype=np.uint8, mode="r")
+        else:
+            self.data = np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @staticmethod
+    def write(strings: List[str], data_path: str, offsets_path: str):
+        """写入字符串数组（先写临时文件再原子替换）"""
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+
+        tmp_path = f"{data_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for item in encoded:
+                f.write(item)
+        os.replace(tmp_path, data_path)
+
+        tmp_path = f"{offsets_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, offsets)
+        os.replace(tmp_path, offsets_path)
+
+
+class VectorIndex:
+    def __init__(self, path: str, mmap: bool = True):
+        """
+        打开（或新建）向量索引
+
+        Args:
+            path: 索引目录
+            mmap: 是否以内存映射方式打开已有向量文件（首次写入时才拷贝到内存）
+        """
+        self.path = path
+        self.embeddings_path = os.path.join(path, "embeddings.npy")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.ids_path = os.path.join(path, "ids.bin")
+        self.ids_offsets_path = os.path.join(path, "ids.offsets.npy")
+        self.documents_path = os.path.join(path, "documents.bin")
+        self.documents_offsets_path = os.path.join(path, "documents.offsets.npy")
+
+        # 以内存映射打开时 ids/documents 为只读的 StringBlob，首次写入时才转换为列表
+        self.ids = []
+        self.documents = []
+        self._position_map: Optional[Dict[str, int]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+
+        if os.path.exists(self.embeddings_path) and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if "ids" in meta:
+                # 旧格式：ID和文本直接存在 meta.json 中
+                self.ids = meta["ids"]
+                self.documents = meta["documents"]
+            else:
+                self.ids = StringBlob(self.ids_path, self.ids_offsets_path)
+                self.documents = StringBlob(self.documents_path, self.documents_offsets_path)
+                if not mmap:
+                    self.ids, self.documents = list(self.ids), list(self.documents)
+            # ID到位置的映射只在按ID读写时才需要，查询不需要，延迟构建
+            self._position_map = None
+            self._size = len(self.ids)
+            if self._size:
+                self._matrix = np.load(self.embeddings_path, mmap_mode="r" if mmap else None)
+
+    @property
+    def _positions(self) -> Dict[str, int]:
+        if self._position_map is None:
+            self._position_map = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        return self._position_map
+
+    def _make_writable(self):
+        """写入前把内存映射的ID和文本转换为列表"""
+        if isinstance(self.ids, StringBlob):
+            self.ids = list(self.ids)
+        if isinstance(self.documents, StringBlob):
+            self.documents = list(self.documents)
+
+    def count(self) -> int:
+        """索引中的向量数量"""
+        return self._size
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _ensure_capacity(self, size: int, dim: int):
+        """保证矩阵可写且容量足够，不足时按两倍扩容"""
+        if self._matrix is None:
+            self._matrix = np.empty((max(size, 1024), dim), dtype=np.float32)
+            return
+        writable = isinstance(self._matrix, np.ndarray) and not isinstance(self._matrix, np.memmap)
+        if writable and self._matrix.shape[0] >= size:
+            return
+        capacity = max(size, self._matrix.shape[0] * 2, 1024)
+        matrix = np.empty((capacity, dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str]):
+        """添加向量（ID已存在时覆盖）"""
+        vectors = self._normalize(embeddings)
+        self._ensure_capacity(self._size + len(ids), vectors.shape[1])
+        self._make_writable()
+
+        for doc_id, vector, document in zip(ids, vectors, documents):
+            position = self._positions.get(doc_id)
+            if position is None:
+                position = self._size
+                self._positions[doc_id] = position
+                self.ids.append(doc_id)
+                self.documents.append(document)
+                self._size += 1
+            else:
+                self.documents[position] = document
+            self._matrix[position] = vector
+
+    def delete(self, ids: List[str]):
+        """删除向量：用最后一行填补被删除的位置，保持矩阵连续"""
+        targets = [doc_id for doc_id in ids if doc_id in self._positions]
+        if not targets:
+            return
+        self._ensure_capacity(self._size, self._matrix.shape[1])
+        self._make_writable()
+
+        for doc_id in targets:
+            position = self._positions.pop(doc_id)
+            last = self._size - 1
+            if position != last:
+                last_id = self.ids[last]
+                self._matrix[position] = self._matrix[last]
+                self.ids[position] = last_id
+                self.documents[position] = self.documents[last]
+                self._positions[last_id] = position
+            self.ids.pop()
+            self.documents.pop()
+            self._size -= 1
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> dict:
+        """按ID获取条目（不传ID时返回全部），返回格式与ChromaDB一致"""
+        include = ["documents"] if include is None else include
+        positions = range(self._size) if ids is None else [
+            self._positions[doc_id] for doc_id in ids if doc_id in self._positions
+        ]
+        result = {"ids": [self.ids[i] for i in positions]}
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in positions]
+        if "embeddings" in include:
+            result["embeddings"] = [self._matrix[i].tolist() for i in positions]
+        return result
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 3) -> dict:
+        """
+        查询最相近的向量，返回格式与ChromaDB一致
+
+        distances 为余弦距离（1 - 余弦相似度）
+        """
+        k = min(n_results, self._size)
+        if k == 0:
+            return {key: [[] for _ in query_embeddings] for key in ("ids", "documents", "distances")}
+
+        queries = self._normalize(query_embeddings)
+        # [num_queries, size] 的相似度矩阵，一次矩阵乘法完成
+        scores = queries @ self._matrix[:self._size].T
+
+        if k < self._size:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(self._size), (len(queries), 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        top = np.take_along_axis(candidates, order, axis=1)
+        top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        return {
+            "ids": [[self.ids[i] for i in row] for row in top],
+            "documents": [[self.documents[i] for i in row] for row in top],
+            "distances": (1.0 - top_scores).tolist()
+        }
+
+    def persist(self):
+        """写入磁盘（先写临时文件再原子替换）"""
+        os.makedirs(self.path, exist_ok=True)
+        matrix = self._matrix[:self._size] if self._matrix is not None else np.empty((0, 0), dtype=np.float32)
+
+        tmp_path = f"{self.embeddings_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix))
+        os.replace(tmp_path, self.embeddings_path)
+
+        StringBlob.write(list(self.ids), self.ids_path, self.ids_offsets_path)
+        StringBlob.write(list(self.documents), self.documents_path, self.documents_offsets_path)
+
+        # meta.json 最后写入，作为一次持久化完成的标志
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"count": self._size, "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0}, f)
+        os.replace(tmp_path, self.meta_path)
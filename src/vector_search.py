@@ -1,84 +1,615 @@
 #!/usr/bin/env python3
 """
-向量搜索模块 - 使用ChromaDB和Transformers
+向量搜索模块 - 使用ChromaDB和可切换的嵌入编码器后端（PyTorch / ONNX Runtime）
+chromadb / torch / transformers 均在用到时才导入，导入本模块本身很快
 """
 
 import os
-import chromadb
-from transformers import AutoTokenizer, AutoModel
-import torch
+import json
+import time
+import copy
+import shutil
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from .document_processor import DocumentProcessor
+from .encoders import load_encoder, parse_model_spec
+from .embedding_cache import EmbeddingCache, CacheLockedError
+from .query_cache import QueryEmbeddingCache
+from .embedding_batcher import EmbeddingBatcher
+from .vector_index import VectorIndex
+from .bm25_index import BM25Index, reciprocal_rank_fusion
+from .tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，不做跨进程保护
+    fcntl = None
+
+
+class IndexSharedError(RuntimeError):
+    """索引目录同时被其他进程打开，不能在线重建"""
+
+def make_chunk_id(model_id: str, text: str) -> str:
+    """
+    根据模型标识和文本内容生成稳定的块ID
+
+    内容不变则ID不变；更换模型后ID全部变化，确保旧模型的向量会被替换
+    """
+    digest = hashlib.sha1(f"{model_id}\n{text}".encode("utf-8")).hexdigest()
+    return f"doc_{digest}"
+
+
+def encode_sorted(encoder, texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    调用编码器批量编码文本，返回与输入同顺序的 [len(texts), dim] 矩阵
+
+    先按文本长度排序，再分批编码：每批只填充到本批最长的序列，
+    长度相近的文本放在同一批可以尽量减少padding带来的无效计算。
+    """
+    # 中文文本的字符数与token数基本成正比，用字符长度排序即可
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    embeddings = np.empty((len(texts), encoder.dim), dtype=np.float32)
+    
+    for start in range(0, len(order), batch_size):
+        batch_indices = order[start:start + batch_size]
+        embeddings[batch_indices] = encoder.encode([texts[i] for i in batch_indices])
+    
+    return embeddings
+
 
 class VectorSearch:
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    # 每次写入向量数据库的最大块数
+    WRITE_BATCH_SIZE = 1000
+    COLLECTION_NAME = "customer_service_knowledge"
+    # 混合检索时每路召回的候选数和RRF平滑常数
+    HYBRID_CANDIDATES = 20
+    RRF_K = 60
+    # 蓝绿切换：记录当前生效集合名的别名文件，以及旧集合切换后保留的秒数（等待进行中的查询结束）
+    ALIAS_FILE = "active_collection.json"
+    RETIRE_GRACE_SECONDS = 60
+    # 打开索引的进程都持有 SERVING_LOCK_FILE 的共享锁；重建前先取 RELOAD_LOCK_FILE，再把共享锁升级为独占锁
+    SERVING_LOCK_FILE = "serving.lock"
+    RELOAD_LOCK_FILE = "reload.lock"
+
+    def __init__(self, persist_directory: str = "./chroma_db", batch_size: int = 32,
+                 model_path: str = "/app/models/bge-small-zh",
+                 cache_dir: Optional[str] = None, cache_size: int = 100000,
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 query_batch_size: int = 16, query_batch_wait_ms: float = 0,
+                 index_backend: str = "chroma",
+                 retrieval_mode: str = "dense", keyword_tokenizer: str = "ngram",
+                 load_model: bool = True, read_only: bool = False, num_threads: int = 0):
         """
         初始化向量搜索系统
+
+        Args:
+            persist_directory: 向量索引持久化目录
+            batch_size: 批量生成嵌入时每批的文本数量
+            model_path: 嵌入模型，格式为 "[后端:]模型路径"，后端可选 torch / onnx / onnx-int8
+            cache_dir: 嵌入缓存目录，为空时不启用缓存
+            cache_size: 嵌入缓存最多保存的向量数量
+            query_cache: 查询嵌入的内存缓存，为空时不启用
+            query_batch_size: 并发查询合并成一批的最大数量
+            query_batch_wait_ms: 合并并发查询时最多等待的毫秒数，为0时不合并
+            index_backend: 向量索引后端，chroma（默认）或 numpy（纯NumPy内存索引）
+            retrieval_mode: 检索方式，dense（仅向量检索）或 hybrid（BM25 + 向量检索，RRF融合）
+            keyword_tokenizer: 混合检索的分词方式，ngram（中文字符bigram）或 jieba
+            load_model: 是否加载嵌入模型；只写入预先算好的嵌入时（如并行建索引的写入进程）可设为False
+            read_only: 只读打开已持久化的索引，不允许原地写入当前集合（蓝绿重建不受影响）
+            num_threads: 模型推理的算子内线程数，0表示由运行时决定
         """
+        self.batch_size = batch_size
+        self.backend, self.model_path = parse_model_spec(model_path)
+        # 模型标识参与块ID和缓存键的计算；torch后端沿用纯路径，兼容已有索引
+        self.model_id = self.model_path if self.backend == "torch" else f"{self.backend}:{self.model_path}"
+        self.query_cache = query_cache
+        # 知识库版本号，集合内容每变化一次加一（用于让上层缓存失效）
+        self.version = 0
+        self.read_only = read_only
+        # 启动各阶段耗时（秒）
+        self.timings: Dict[str, float] = {}
+
         print("🔄 初始化向量搜索系统...")
         
-        # 初始化ChromaDB向量数据库
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(
-            name="customer_service_knowledge"
-        )
+        # 初始化向量索引：ChromaDB 或 纯NumPy索引（接口相同）
+        start = time.perf_counter()
+        self.index_backend = index_backend
+        self.persist_directory = persist_directory
+        if index_backend == "chroma":
+            import chromadb
+            self.client = chromadb.PersistentClient(path=persist_directory)
+        elif index_backend == "numpy":
+            self.client = None
+        else:
+            raise ValueError(f"不支持的向量索引后端: {index_backend}（可选: chroma, numpy）")
+        # 登记本进程在使用这个索引目录（其他进程正在重建时等它切换完成，再读取别名）
+        self._serving_lock = self._open_lock_file(self.SERVING_LOCK_FILE)
+        if self._serving_lock is not None:
+            fcntl.flock(self._serving_lock, fcntl.LOCK_SH)
+        # 别名文件指向当前生效的集合；还没有做过切换时使用默认集合名
+        self.collection_name = self._read_alias() or self.COLLECTION_NAME
+        self.collection = self._open_collection(self.collection_name)
+        self.timings["index_open"] = time.perf_counter() - start
+        
+        # 后台重建状态
+        self._reload_lock = threading.Lock()
+        self._retired: Set[str] = set()
+        self.reload_status: Dict[str, object] = {"state": "idle"}
+        
+        # 混合检索：BM25关键词索引与向量检索并行执行，结果用RRF融合
+        self.retrieval_mode = retrieval_mode
+        self.keyword_tokenizer = keyword_tokenizer
+        self.keyword_index = None
+        if retrieval_mode == "hybrid":
+            self.keyword_index = BM25Index(tokenizer=keyword_tokenizer)
+            self._keyword_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="keyword-search")
+            self._keyword_index_lock = threading.Lock()
+        elif retrieval_mode != "dense":
+            raise ValueError(f"不支持的检索方式: {retrieval_mode}（可选: dense, hybrid）")
+        
+        self.encoder = None
+        self.tokenizer = None
+        self.embedding_cache = None
+        self.query_batcher = None
+        if not load_model:
+            print("✅ 向量搜索系统初始化完成（未加载嵌入模型）")
+            return
         
         # 加载中文嵌入模型
-        print("🔄 加载嵌入模型...")
-        self.tokenizer = AutoTokenizer.from_pretrained('/app/models/bge-small-zh')
-        self.model = AutoModel.from_pretrained('/app/models/bge-small-zh')
+        print(f"🔄 加载嵌入模型（{self.backend}）...")
+        start = time.perf_counter()
+        self.encoder = load_encoder(self.backend, self.model_path, num_threads=num_threads)
+        self.tokenizer = self.encoder.tokenizer
+        self.timings["model_load"] = time.perf_counter() - start
         
-        # 设置模型为评估模式
-        self.model.eval()
+        # 磁盘嵌入缓存：建索引和查询共用
+        if cache_dir:
+            try:
+                self.embedding_cache = EmbeddingCache(cache_dir, self.encoder.dim, capacity=cache_size)
+                print(f"💾 嵌入缓存已启用: {cache_dir}（已缓存 {len(self.embedding_cache.slots)} 条）")
+            except CacheLockedError as e:
+                # 多worker部署时只有第一个打开的进程使用磁盘缓存，其余进程直接计算
+                print(f"⚠️  {e}，本进程不启用嵌入缓存")
+        
+        # 查询嵌入微批调度：合并并发请求的查询，一次前向计算完成
+        if query_batch_wait_ms > 0:
+            self.start_query_batcher(query_batch_size, query_batch_wait_ms)
         
         print("✅ 向量搜索系统初始化完成")
     
+    def start_query_batcher(self, max_batch_size: int, max_wait_ms: float):
+        """
+        启动查询嵌入微批调度线程
+
+        线程不会被fork继承：prefork模式下应在fork之后由每个worker各自启动
+        """
+        self.query_batcher = EmbeddingBatcher(
+            self.get_embeddings, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+        )
+    
+    def chunking_tokenizer(self):
+        """
+        返回供文档切块使用的独立tokenizer副本（未加载模型时为None）
+
+        编码器的tokenizer只在 _tokenizer_lock 内使用：fast tokenizer 每次调用都会改写
+        padding/truncation 状态，/admin/reload 在后台线程切块时若与查询编码共用同一实例，
+        会触发 "Already borrowed"。副本与原实例互不影响，切块也不必和查询抢锁。
+        """
+        return copy.deepcopy(self.tokenizer) if self.tokenizer is not None else None
+    
     def get_embedding(self, text: str) -> List[float]:
         """
         将文本转换为向量嵌入
         """
-        # 对输入文本进行编码
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        return self.get_embeddings([text])[0]
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        生成查询向量，优先使用查询嵌入缓存
+        """
+        with span("embed"):
+            if self.query_cache is not None:
+                embedding = self.query_cache.get(query)
+                if embedding is not None:
+                    return embedding
+            
+            if self.query_batcher is not None:
+                embedding = self.query_batcher.embed(query)
+            else:
+                embedding = self.get_embedding(query)
+            if self.query_cache is not None:
+                self.query_cache.put(query, embedding)
+            return embedding
+    
+    def get_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """
+        批量将文本转换为向量嵌入
+
+        启用嵌入缓存时先查缓存，只对未命中的文本调用模型。
+        返回结果的顺序与输入一致。
+        """
+        if not texts:
+            return []
+        if self.embedding_cache is None:
+            return self._encode(texts, batch_size)
         
-        # 生成嵌入
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            # 使用[CLS] token的嵌入作为句子表示
-            embedding = outputs.last_hidden_state[:, 0, :].squeeze().numpy()
+        keys = [EmbeddingCache.make_key(self.model_id, text) for text in texts]
+        embeddings = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
         
-        return embedding.tolist()
+        if missing:
+            computed = self._encode([texts[i] for i in missing], batch_size)
+            for i, embedding in zip(missing, computed):
+                self.embedding_cache.put(keys[i], embedding)
+                embeddings[i] = embedding
+        
+        return embeddings
+    
+    def _encode(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """调用模型批量编码文本（按长度排序分批）"""
+        return encode_sorted(self.encoder, texts, batch_size or self.batch_size).tolist()
+    
+    def chunk_id(self, text: str) -> str:
+        """根据模型标识和文本内容生成稳定的块ID"""
+        return make_chunk_id(self.model_id, text)
     
     def add_documents(self, documents: List[str]):
         """
-        将文档添加到向量数据库
+        将文档增量同步到向量数据库
         """
-        # 清空现有集合，避免重复添加
-        try:
-            self.collection.delete(where={})
-        except:
-            pass
         print(f"📝 正在处理 {len(documents)} 个文档...")
+        self.add_documents_stream(documents)
+    
+    def add_documents_stream(self, chunks: Iterable[str]) -> Dict[str, float]:
+        """
+        流式增量同步：逐块读取，攒满一批就生成嵌入并写入，不在内存中保留整个语料
+
+        以内容哈希作为块ID，与库中已有的ID做差集：只为新增或内容变化的块生成嵌入，
+        同步结束后删除语料中已不存在的块。语料未变化时不会调用模型。
+        内存中只保留块ID集合和当前一批待写入的块。
+        """
+        return self.add_embedded_stream((self.chunk_id(chunk), chunk, None) for chunk in chunks)
+    
+    def existing_ids(self) -> Set[str]:
+        """向量数据库中已有的全部块ID"""
+        return set(self.collection.get(include=[])["ids"])
+    
+    def add_embedded_stream(self, records: Iterable[Tuple[str, str, Optional[List[float]]]]) -> Dict[str, float]:
+        """
+        流式增量同步已切分好的块，records 为 (块ID, 文本, 嵌入) 序列
+
+        嵌入可以在别处预先算好（如并行建索引的工作进程），为None时由本进程生成；
+        库中已有的块不需要嵌入，但仍需出现在序列中，否则会被当作已删除。
+        返回同步统计：新增、删除、未变化的块数和写入耗时。
+        """
+        if self.read_only:
+            raise RuntimeError("索引以只读方式打开，请使用 reload 重建索引")
+        existing_ids = self.existing_ids()
+        seen_ids = set()
+        batch_ids: List[str] = []
+        batch_docs: List[str] = []
+        batch_embeddings: List[Optional[List[float]]] = []
+        new_count = 0
+        write_seconds = 0.0
+        
+        for chunk_id, chunk, embedding in records:
+            # 相同内容的块只保留一份
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            
+            if self.keyword_index is not None and chunk_id not in self.keyword_index.documents:
+                self.keyword_index.add([chunk_id], [chunk])
+            if chunk_id in existing_ids:
+                continue
+            
+            batch_ids.append(chunk_id)
+            batch_docs.append(chunk)
+            batch_embeddings.append(embedding)
+            if len(batch_ids) >= self.WRITE_BATCH_SIZE:
+                start = time.perf_counter()
+                self._write_batch(batch_ids, batch_docs, batch_embeddings)
+                write_seconds += time.perf_counter() - start
+                new_count += len(batch_ids)
+                print(f"  生成嵌入进度: 已写入 {new_count} 个新文本块")
+                batch_ids, batch_docs, batch_embeddings = [], [], []
         
-        # 为每个文档生成嵌入
-        embeddings = []
-        for i, doc in enumerate(documents):
-            if i % 10 == 0:  # 每10个文档打印一次进度
-                print(f"  生成嵌入进度: {i}/{len(documents)}")
-            embedding = self.get_embedding(doc)
-            embeddings.append(embedding)
+        if batch_ids:
+            start = time.perf_counter()
+            self._write_batch(batch_ids, batch_docs, batch_embeddings)
+            write_seconds += time.perf_counter() - start
+            new_count += len(batch_ids)
         
-        # 为文档创建ID
-        ids = [f"doc_{i}" for i in range(len(documents))]
+        stats = {"new": new_count, "removed": 0, "unchanged": len(seen_ids) - new_count,
+                 "write_seconds": write_seconds}
         
-        # 添加到向量数据库
-        self.collection.add(
-            embeddings=embeddings,
+        # 删除语料中已不存在的块；语料为空时保留已有数据，避免数据文件缺失时误清空知识库
+        if not seen_ids:
+            print("⚠️  没有读取到任何文本块，保留向量数据库现有内容")
+            return stats
+        removed_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in seen_ids]
+        if removed_ids:
+            self.collection.delete(ids=removed_ids)
+            if self.keyword_index is not None:
+                self.keyword_index.delete(removed_ids)
+        stats["removed"] = len(removed_ids)
+        
+        if new_count or removed_ids:
+            self.version += 1
+            # NumPy索引需要显式落盘（ChromaDB写入时已持久化）
+            if self.index_backend == "numpy":
+                self.collection.persist()
+        
+        print(f"🎉 向量数据库同步完成：新增 {new_count} 个，删除 {len(removed_ids)} 个，"
+              f"未变化 {len(seen_ids) - new_count} 个")
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+            print(f"💾 嵌入缓存统计: {self.embedding_cache.stats()}")
+        return stats
+    
+    def _write_batch(self, ids: List[str], documents: List[str],
+                     embeddings: Optional[List[Optional[List[float]]]] = None, collection=None):
+        """把一批新块写入向量数据库（默认写入当前集合），缺少嵌入的块先生成嵌入"""
+        collection = collection if collection is not None else self.collection
+        embeddings = list(embeddings) if embeddings is not None else [None] * len(ids)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            for i, embedding in zip(missing, self.get_embeddings([documents[i] for i in missing])):
+                embeddings[i] = embedding
+        collection.add(
+            embeddings=[np.asarray(embedding, dtype=np.float32).tolist() for embedding in embeddings],
             documents=documents,
             ids=ids
         )
+    
+    def _read_alias(self) -> Optional[str]:
+        """读取别名文件中记录的生效集合名"""
+        path = os.path.join(self.persist_directory, self.ALIAS_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["collection"]
+    
+    def _write_alias(self, name: str):
+        """原子地更新别名文件（先写临时文件再替换）"""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        path = os.path.join(self.persist_directory, self.ALIAS_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"collection": name, "updated_at": time.time()}, f)
+        os.replace(tmp_path, path)
+    
+    def _open_lock_file(self, name: str):
+        """打开索引目录下的锁文件，不支持文件锁或目录不可写时返回None"""
+        if fcntl is None:
+            return None
+        try:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            return open(os.path.join(self.persist_directory, name), "a")
+        except OSError as e:
+            print(f"⚠️  无法创建锁文件 {name}: {e}，不检测其他进程")
+            return None
+    
+    def _lock_for_reload(self):
+        """
+        确认只有本进程在使用索引目录，并在重建期间独占
+
+        uvicorn --workers N 等多进程部署中，每个进程各自持有集合的引用，一个进程切换并删除旧集合后，
+        其他进程的查询会失败，清理中断的重建时也可能删掉别的进程正在构建的集合，所以直接拒绝
+        """
+        if self._serving_lock is None:
+            return None
+        guard = self._open_lock_file(self.RELOAD_LOCK_FILE)
+        if guard is None:
+            return None
+        try:
+            fcntl.flock(guard, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            guard.close()
+            raise IndexSharedError("其他进程正在重建索引")
+        try:
+            fcntl.flock(self._serving_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # flock 的锁转换不是原子的，失败时原来的共享锁可能已被释放，重新加上
+            fcntl.flock(self._serving_lock, fcntl.LOCK_SH)
+            guard.close()
+            raise IndexSharedError("有其他进程在使用同一索引目录（如 uvicorn --workers N），不支持在线重建")
+        return guard
+    
+    def _unlock_after_reload(self, guard):
+        if guard is not None:
+            fcntl.flock(self._serving_lock, fcntl.LOCK_SH)
+            guard.close()
+    
+    def _open_collection(self, name: str):
+        """打开（或新建）指定名称的集合"""
+        if self.index_backend == "chroma":
+            return self.client.get_or_create_collection(name=name)
+        return VectorIndex(os.path.join(self.persist_directory, name))
+    
+    def _list_collections(self) -> List[str]:
+        """列出本系统创建的全部集合名"""
+        if self.index_backend == "chroma":
+            # chromadb 0.6 起 list_collections 直接返回名称
+            names = [getattr(item, "name", item) for item in self.client.list_collections()]
+        elif os.path.isdir(self.persist_directory):
+            names = [name for name in os.listdir(self.persist_directory)
+                     if os.path.isdir(os.path.join(self.persist_directory, name))]
+        else:
+            names = []
+        return [name for name in names if name.startswith(self.COLLECTION_NAME)]
+    
+    def _drop_collection(self, name: str):
+        """删除集合及其数据"""
+        try:
+            if self.index_backend == "chroma":
+                self.client.delete_collection(name=name)
+            else:
+                shutil.rmtree(os.path.join(self.persist_directory, name), ignore_errors=True)
+            print(f"🗑️  已删除集合: {name}")
+        except Exception as e:
+            print(f"⚠️  删除集合失败 {name}: {e}")
+        finally:
+            self._retired.discard(name)
+    
+    def reload(self, chunks: Iterable[str]) -> Dict[str, object]:
+        """
+        蓝绿重建：在新集合中构建完整索引，完成后原子地切换过去，查询全程不受影响
+
+        内容未变化的块直接从当前集合复制向量，只为新块生成嵌入。
+        切换后旧集合保留 RETIRE_GRACE_SECONDS 秒再删除，让进行中的查询正常结束。
+        其他进程也打开了同一索引目录时抛出 IndexSharedError。
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise RuntimeError("已有重建任务在执行")
+        try:
+            guard = self._lock_for_reload()
+            try:
+                return self._reload(chunks)
+            finally:
+                self._unlock_after_reload(guard)
+        finally:
+            self._reload_lock.release()
+    
+    def reload_in_background(self, chunks: Iterable[str]) -> bool:
+        """
+        在后台线程中执行 reload，已有重建任务时返回False
+
+        其他进程也打开了同一索引目录时抛出 IndexSharedError
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            guard = self._lock_for_reload()
+        except IndexSharedError:
+            self._reload_lock.release()
+            raise
+        self.reload_status = {"state": "running", "started_at": time.time()}
+        
+        def run():
+            try:
+                self._reload(chunks)
+            except Exception as e:
+                print(f"❌ 重建索引失败: {e}")
+                if self.reload_status.get("state") == "running":
+                    self.reload_status = {"state": "failed", "started_at": self.reload_status["started_at"],
+                                          "finished_at": time.time(), "error": str(e)}
+            finally:
+                self._unlock_after_reload(guard)
+                self._reload_lock.release()
         
-        print(f"🎉 成功将 {len(documents)} 个文档添加到向量数据库")
+        threading.Thread(target=run, name="index-reload", daemon=True).start()
+        return True
+    
+    def _reload(self, chunks: Iterable[str]) -> Dict[str, object]:
+        """执行重建（调用方需持有 _reload_lock）"""
+        started_at = time.time()
+        self.reload_status = {"state": "running", "started_at": started_at}
+        
+        # 清理上次中断的重建留下的集合（持有独占锁，不会有其他进程正在构建）
+        for name in self._list_collections():
+            if name != self.collection_name and name not in self._retired:
+                self._drop_collection(name)
+        
+        old_name, old_collection = self.collection_name, self.collection
+        old_ids = set(old_collection.get(include=[])["ids"])
+        new_name = f"{self.COLLECTION_NAME}_{int(started_at * 1000)}"
+        new_collection = self._open_collection(new_name)
+        keyword_index = BM25Index(tokenizer=self.keyword_tokenizer) if self.keyword_index is not None else None
+        print(f"🔄 开始重建索引: {new_name}")
+        
+        try:
+            seen_ids = set()
+            batch_ids: List[str] = []
+            batch_docs: List[str] = []
+            copied = 0
+            
+            def flush():
+                nonlocal copied
+                # 当前集合中已有的块直接复制向量
+                reused = [chunk_id for chunk_id in batch_ids if chunk_id in old_ids]
+                stored = old_collection.get(ids=reused, include=["embeddings"]) if reused else {"ids": []}
+                # ChromaDB新版本返回的是numpy数组，不能直接做真值判断
+                stored_embeddings = stored.get("embeddings")
+                vectors = dict(zip(stored["ids"], stored_embeddings if stored_embeddings is not None else []))
+                copied += len(vectors)
+                self._write_batch(batch_ids, batch_docs, [vectors.get(chunk_id) for chunk_id in batch_ids],
+                                  collection=new_collection)
+                if keyword_index is not None:
+                    keyword_index.add(batch_ids, batch_docs)
+            
+            for chunk in chunks:
+                chunk_id = self.chunk_id(chunk)
+                if chunk_id in seen_ids:
+                    continue
+                seen_ids.add(chunk_id)
+                batch_ids.append(chunk_id)
+                batch_docs.append(chunk)
+                if len(batch_ids) >= self.WRITE_BATCH_SIZE:
+                    flush()
+                    batch_ids, batch_docs = [], []
+            if batch_ids:
+                flush()
+            
+            if not seen_ids:
+                raise ValueError("没有读取到任何文本块，保留当前索引")
+            if self.index_backend == "numpy":
+                new_collection.persist()
+        except Exception as e:
+            self._drop_collection(new_name)
+            self.reload_status = {"state": "failed", "started_at": started_at,
+                                  "finished_at": time.time(), "error": str(e)}
+            raise
+        
+        # 先更新别名文件再切换内存中的引用：进程重启后也会打开新集合
+        self._write_alias(new_name)
+        self.collection, self.keyword_index = new_collection, keyword_index
+        self.collection_name = new_name
+        self.version += 1
+        
+        # 旧集合延迟删除
+        self._retired.add(old_name)
+        timer = threading.Timer(self.RETIRE_GRACE_SECONDS, self._drop_collection, args=(old_name,))
+        timer.daemon = True
+        timer.start()
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+        
+        self.reload_status = {
+            "state": "done",
+            "started_at": started_at,
+            "finished_at": time.time(),
+            "collection": new_name,
+            "chunks": len(seen_ids),
+            "copied": copied,
+            "embedded": len(seen_ids) - copied
+        }
+        print(f"🎉 索引已切换到 {new_name}：共 {len(seen_ids)} 个文本块，"
+              f"复用 {copied} 个向量，新生成 {len(seen_ids) - copied} 个")
+        return self.reload_status
+    
+    def warm_up(self, queries: List[str]) -> float:
+        """
+        用合成查询预热：逐条和整批各编码一次，并执行向量检索（混合检索时同时加载关键词索引），
+        让首个真实请求不用承担算子初始化、内存映射页面加载等一次性开销。
+        直接调用模型，不写入查询缓存。返回耗时（秒）
+        """
+        start = time.perf_counter()
+        embeddings = [self._encode([query])[0] for query in queries]
+        self._encode(queries)
+        if self.collection.count() > 0:
+            if self.keyword_index is not None:
+                self._hybrid_search(queries, embeddings, top_k=3)
+            else:
+                self.collection.query(query_embeddings=embeddings, n_results=3)
+        self.timings["warm_up"] = time.perf_counter() - start
+        return self.timings["warm_up"]
     
     def search(self, query: str, top_k: int = 3) -> List[str]:
         """
@@ -87,13 +618,27 @@ class VectorSearch:
         print(f"🔍 正在搜索: '{query}'")
         
         # 将查询转换为嵌入
-        query_embedding = self.get_embedding(query)
+        query_embedding = self.embed_query(query)
+        return self.search_by_embedding(query_embedding, top_k, query=query)
+    
+    def search_by_embedding(self, query_embedding: List[float], top_k: int = 3,
+                            query: Optional[str] = None) -> List[str]:
+        """
+        用已计算好的查询向量搜索最相关的文档
+
+        混合检索模式下需要同时传入查询文本 query，用于BM25关键词检索
+        """
+        if self.keyword_index is not None and query:
+            relevant_docs = self._hybrid_search([query], [query_embedding], top_k)[0]
+            print(f"✅ 找到 {len(relevant_docs)} 个相关结果（混合检索）")
+            return relevant_docs
         
         # 在向量数据库中搜索
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        with span("retrieve"):
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k
+            )
         
         if results['documents']:
             relevant_docs = results['documents'][0]
@@ -102,6 +647,75 @@ class VectorSearch:
         else:
             print("❌ 没有找到相关结果")
             return []
+    
+    def _ensure_keyword_index(self):
+        """关键词索引为空但向量库中已有文档时（如直接打开已有索引），从向量库加载全部文档"""
+        with self._keyword_index_lock:
+            if self.keyword_index.count() == 0 and self.collection.count() > 0:
+                stored = self.collection.get(include=["documents"])
+                self.keyword_index.sync(dict(zip(stored["ids"], stored["documents"])))
+    
+    def _hybrid_search(self, queries: List[str], embeddings: List[List[float]], top_k: int) -> List[List[str]]:
+        """
+        混合检索：BM25在后台线程执行，同时在当前线程做向量检索，两路结果用RRF融合
+        """
+        self._ensure_keyword_index()
+        depth = max(top_k, self.HYBRID_CANDIDATES)
+        # 取一次引用，重建切换集合时本次查询仍使用同一套索引
+        collection, keyword_index = self.collection, self.keyword_index
+        
+        def keyword_search():
+            with span("keyword"):
+                return [keyword_index.search(query, depth) for query in queries]
+        
+        # 复制上下文，后台线程中的span也记入当前请求的追踪
+        keyword_future = self._keyword_executor.submit(contextvars.copy_context().run, keyword_search)
+        with span("retrieve"):
+            dense = collection.query(query_embeddings=embeddings, n_results=depth)
+        keyword_hits = keyword_future.result()
+        
+        fused_results = []
+        for dense_ids, dense_docs, hits in zip(dense['ids'], dense['documents'], keyword_hits):
+            documents = dict(zip(dense_ids, dense_docs))
+            ranking = reciprocal_rank_fusion([dense_ids, [doc_id for doc_id, _ in hits]], k=self.RRF_K)
+            fused_results.append([
+                documents[doc_id] if doc_id in documents else keyword_index.documents[doc_id]
+                for doc_id in ranking[:top_k]
+            ])
+        return fused_results
+
+    def search_many(self, queries: List[str], top_k: int = 3) -> List[List[str]]:
+        """
+        批量搜索：所有查询一次前向计算生成向量，一次向量数据库查询返回结果
+
+        返回与 queries 同顺序的结果列表
+        """
+        if not queries:
+            return []
+        print(f"🔍 正在批量搜索 {len(queries)} 个问题")
+        
+        # 先查查询嵌入缓存，未命中的查询合并成一批编码
+        embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        if self.query_cache is not None:
+            embeddings = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            with span("embed"):
+                computed = self.get_embeddings([queries[i] for i in missing], batch_size=len(missing))
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+                if self.query_cache is not None:
+                    self.query_cache.put(queries[i], embedding)
+        
+        if self.keyword_index is not None:
+            return self._hybrid_search(queries, embeddings, top_k)
+        
+        with span("retrieve"):
+            results = self.collection.query(
+                query_embeddings=embeddings,
+                n_results=top_k
+            )
+        return results['documents'] or [[] for _ in queries]
 
 def demo_vector_search():
     """演示向量搜索功能"""
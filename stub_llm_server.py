@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+本地模拟大模型服务 - 用于基准测试和联调，不需要真实的API密钥
+接口：
+    POST /chat/completions     OpenAI兼容接口（DeepSeek / OpenAI 代理使用）
+    POST /v1/chat/completions  同上
+    POST /chat                 本地模型接口，返回 {"answer": ...}
+
+每个请求固定等待 --latency-ms 毫秒模拟生成耗时；
+请求带 "stream": true 时以SSE逐字返回：等待 --latency-ms 后输出首个token，
+之后按 --tokens-per-second 的速率输出其余token，以 data: [DONE] 结束；
+--error-rate 按比例返回503，用于验证客户端的重试。
+
+用法:
+    python stub_llm_server.py --port 9000 --latency-ms 200 --tokens-per-second 30
+    DEEPSEEK_BASE_URL=http://127.0.0.1:9000 python robust_ai_proxy.py
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="模拟大模型服务")
+settings = {"latency_ms": 200.0, "error_rate": 0.0, "tokens_per_second": 30.0}
+stats = {"requests": 0, "errors": 0}
+
+
+def make_answer(question: str) -> str:
+    return f"您好，关于「{question[:50]}」：这是模拟大模型生成的回答。"
+
+
+async def stream_tokens(answer: str, model: str):
+    """按固定速率逐字输出OpenAI格式的流式分片（首个token的等待已在 simulate 中完成）"""
+    interval = 1.0 / settings["tokens_per_second"]
+    for i, token in enumerate(answer):
+        if i:
+            await asyncio.sleep(interval)
+        chunk = {
+            "id": f"stub-{stats['requests']}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+async def simulate():
+    """模拟生成耗时，按比例返回错误；返回错误响应或None"""
+    stats["requests"] += 1
+    await asyncio.sleep(settings["latency_ms"] / 1000)
+    if random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": "simulated overload"})
+    return None
+
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = await simulate()
+    if error is not None:
+        return error
+    question = body["messages"][-1]["content"] if body.get("messages") else ""
+    answer = make_answer(question)
+    if body.get("stream"):
+        return StreamingResponse(stream_tokens(answer, body.get("model", "stub")), media_type="text/event-stream")
+    return {
+        "id": f"stub-{stats['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(question), "completion_tokens": len(answer),
+                  "total_tokens": len(question) + len(answer)}
+    }
+
+
+@app.post("/chat")
+async def local_chat(request: Request):
+    body = await request.json()
+    error = await simulate()
+    if error is not None:
+        return error
+    return {"answer": make_answer(body.get("question", ""))}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=30, help="流式输出的速率")
+    parser.add_argument("--ssl-keyfile", help="启用HTTPS（测量TLS握手开销时使用）")
+    parser.add_argument("--ssl-certfile")
+    args = parser.parse_args()
+
+    settings.update(latency_ms=args.latency_ms, error_rate=args.error_rate, tokens_per_second=args.tokens_per_second)
+    print(f"🤖 模拟大模型服务: {args.host}:{args.port}（延迟 {args.latency_ms}ms，"
+          f"流式 {args.tokens_per_second} token/s，错误率 {args.error_rate}）")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning",
+                ssl_keyfile=args.ssl_keyfile, ssl_certfile=args.ssl_certfile)
@@ -0,0 +1,19 @@
+from src.document_processor import DocumentProcessor
+
+
+def test_long_cjk_sentence_with_one_space_respects_chunk_size():
+    processor = DocumentProcessor(chunk_size=50)
+    sentence = "退" * 120 + " " + "货" * 80
+    chunks = processor.split_paragraph(sentence)
+
+    assert chunks
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert "".join(chunks) == sentence.replace(" ", "")
+
+
+def test_english_text_still_splits_on_words():
+    processor = DocumentProcessor(chunk_size=20)
+    chunks = processor.split_paragraph("return the item within thirty days of delivery")
+
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == "return the item within thirty days of delivery".split()
@@ -0,0 +1,41 @@
+"""EmbeddingCache 持久化与崩溃恢复"""
+
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache
+
+
+def crash(cache: EmbeddingCache):
+    """模拟进程被杀：停止后台落盘线程、释放文件锁，但不执行 close() 中的落盘"""
+    cache._closed.set()
+    cache._flusher.join()
+    cache._lock_file.close()
+
+
+def test_reopen_after_close_keeps_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, capacity=4)
+    cache.put("a", [1.0, 2.0, 3.0, 4.0])
+    cache.close()
+    cache._lock_file.close()
+
+    reopened = EmbeddingCache(str(tmp_path), dim=4, capacity=4)
+    assert reopened.get("a") == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_evicted_slot_is_not_served_after_crash(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, capacity=2, flush_interval=3600)
+    cache.put("a", [1.0] * 4)
+    cache.put("b", [2.0] * 4)
+    cache.flush()
+    # 缓存已满："a" 被淘汰，其槽位被 "c" 复用，但磁盘上的索引仍是 a、b
+    cache.put("c", [3.0] * 4)
+    crash(cache)
+
+    reopened = EmbeddingCache(str(tmp_path), dim=4, capacity=2, flush_interval=3600)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == [2.0] * 4
+    assert reopened.get("c") is None
+    # 过期映射被丢弃后槽位可以重新使用
+    reopened.put("d", [4.0] * 4)
+    assert reopened.get("d") == [4.0] * 4
+    assert np.array_equal(reopened.vectors[reopened.slots["b"]], np.full(4, 2.0, dtype=np.float16))
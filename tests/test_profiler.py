@@ -0,0 +1,20 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from config import config
+from src import api_service, profiler
+
+
+def test_continuous_profiler_rejects_non_positive_hz():
+    with pytest.raises(ValueError, match="采样频率"):
+        profiler.ContinuousProfiler(hz=0)
+
+
+def test_continuous_profile_endpoints_report_disabled(monkeypatch):
+    monkeypatch.setattr(api_service, "continuous_profiler", None)
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    client = TestClient(api_service.app)
+    headers = {"X-Admin-Token": "secret"}
+
+    assert client.get("/admin/profile/continuous", headers=headers).status_code == 409
+    assert client.post("/admin/profile/continuous", headers=headers).status_code == 409
@@ -0,0 +1,127 @@
+"""流式接口经 stub_llm_server.py 的端到端测试"""
+
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import ai_proxy
+import robust_ai_proxy
+import stub_llm_server
+from config import config
+from src import api_service
+
+DOCUMENTS = ["自签收之日起7天内，商品未使用且包装完好可申请无理由退货。", "退款将在收到退货商品后3-5个工作日内原路退回。"]
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "stub_llm_server.py", "--port", str(port), "--latency-ms", "20", "--tokens-per-second", "500"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"{url}/stats", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def parse_events(body: str):
+    """解析SSE响应体，返回 (token列表, 其余事件列表)"""
+    tokens, others = [], []
+    for event in body.split("\n\n"):
+        data = next((line[5:] for line in event.split("\n") if line.startswith("data:")), None)
+        if data is None:
+            continue
+        payload = json.loads(data)
+        if "token" in payload:
+            tokens.append(payload["token"])
+        else:
+            others.append(payload)
+    return tokens, others
+
+
+def first_token_count(model: str) -> float:
+    return REGISTRY.get_sample_value("llm_first_token_seconds_count", {"model": model}) or 0.0
+
+
+@pytest.mark.parametrize("module, url_attr, key_attr", [
+    (ai_proxy, "DEEPSEEK_BASE_URL", "DEEPSEEK_API_KEY"),
+    (robust_ai_proxy, "BASE_URL", "API_KEY"),
+])
+def test_proxy_stream_reports_first_token(stub_url, monkeypatch, module, url_attr, key_attr):
+    monkeypatch.setattr(module, url_attr, stub_url)
+    monkeypatch.setattr(module, key_attr, "stub")
+    before = first_token_count("deepseek-chat")
+
+    response = module.app.test_client().post("/api/chat/stream", json={"question": "退货需要几天"})
+    tokens, others = parse_events(response.get_data(as_text=True))
+
+    assert "".join(tokens) == stub_llm_server.make_answer("退货需要几天")
+    assert others[-1]["done"] is True and others[-1]["first_token_ms"] > 0
+    assert first_token_count("deepseek-chat") == before + 1
+    assert b"llm_first_token_seconds" in module.app.test_client().get("/metrics").data
+
+
+class FixedRetriever:
+    """代替已加载模型的 VectorSearch，固定返回 DOCUMENTS"""
+
+    def embed_query(self, query):
+        return [0.0]
+
+    def search_by_embedding(self, query_embedding, top_k=3, query=None):
+        return DOCUMENTS[:top_k]
+
+
+@pytest.fixture
+def rag_service(monkeypatch):
+    monkeypatch.setattr(api_service, "vector_search", FixedRetriever())
+    # 不进入 with 块，不触发启动事件（启动时会加载嵌入模型）
+    return TestClient(api_service.app)
+
+
+def test_api_service_streams_llm_answer_with_sources(stub_url, monkeypatch, rag_service):
+    monkeypatch.setattr(config, "LLM_BASE_URL", stub_url)
+    monkeypatch.setattr(config, "LLM_API_KEY", "stub")
+    before = first_token_count(config.LLM_MODEL)
+
+    response = rag_service.post("/api/chat/stream", json={"question": "退货需要几天"})
+    assert response.status_code == 200
+    tokens, others = parse_events(response.text)
+
+    assert len(tokens) > 1 and "".join(tokens).startswith("您好")
+    done = others[-1]
+    assert done["done"] is True
+    assert done["sources"] == DOCUMENTS and done["confidence"] == 0.5
+    assert done["first_token_ms"] > 0
+    assert first_token_count(config.LLM_MODEL) == before + 1
+
+
+def test_api_service_stream_without_llm_returns_summary(monkeypatch, rag_service):
+    monkeypatch.setattr(config, "LLM_API_KEY", "")
+
+    response = rag_service.post("/api/chat/stream", json={"question": "退货需要几天"})
+    tokens, others = parse_events(response.text)
+
+    assert tokens == [api_service.build_answer(DOCUMENTS)["answer"]]
+    assert others[-1]["sources"] == DOCUMENTS and others[-1]["first_token_ms"] is None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+验证ONNX编码器与PyTorch编码器的[CLS]向量一致性
+
+    onnx       与PyTorch逐元素误差应极小（余弦相似度 > 0.9999）
+    onnx-int8  量化后允许少量误差（余弦相似度 > 0.99），且检索排序基本不变
+
+用法:
+    python verify_onnx_parity.py --model /app/models/bge-small-zh
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from src.encoders import TorchEncoder, OnnxEncoder
+
+TEXTS = [
+    "退货需要几天时间",
+    "客服电话是多少",
+    "自签收之日起7天内，商品未使用且包装完好可申请无理由退货。",
+    "定制商品、生鲜食品以及已拆封的贴身衣物不支持退货。",
+    "因质量问题产生的退货运费由商家承担，非质量问题由买家承担。" * 5,
+    "订单号 20240101-88888 的物流信息在哪里查看？",
+]
+
+# 各后端允许的最小余弦相似度
+THRESHOLDS = {"onnx": 0.9999, "onnx-int8": 0.99}
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def check(name: str, reference: np.ndarray, candidate: np.ndarray) -> bool:
+    """对比两组向量，打印误差并返回是否通过"""
+    similarities = cosine(reference, candidate)
+    max_abs_diff = float(np.abs(reference - candidate).max())
+
+    # 检索一致性：用第一条作为查询，其余作为文档，比较排序
+    ref_rank = np.argsort(-cosine(np.repeat(reference[:1], len(reference) - 1, 0), reference[1:]))
+    cand_rank = np.argsort(-cosine(np.repeat(candidate[:1], len(candidate) - 1, 0), candidate[1:]))
+
+    passed = similarities.min() >= THRESHOLDS[name]
+    print(f"{'✅' if passed else '❌'} {name:10s} 最小余弦相似度={similarities.min():.6f}  "
+          f"最大绝对误差={max_abs_diff:.6f}  检索排序一致={bool((ref_rank == cand_rank).all())}")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX编码器一致性验证")
+    parser.add_argument("--model", default="/app/models/bge-small-zh")
+    args = parser.parse_args()
+
+    print("=== ONNX / PyTorch 嵌入一致性验证 ===")
+    reference = TorchEncoder(args.model).encode(TEXTS)
+
+    results = [
+        check("onnx", reference, OnnxEncoder(args.model, quantize=False).encode(TEXTS)),
+        check("onnx-int8", reference, OnnxEncoder(args.model, quantize=True).encode(TEXTS)),
+    ]
+
+    # 批量编码与逐条编码结果应一致（padding不影响[CLS]向量）
+    single = np.vstack([TorchEncoder(args.model).encode([text]) for text in TEXTS[:2]])
+    padding_ok = np.allclose(single, reference[:2], atol=1e-4)
+    print(f"{'✅' if padding_ok else '❌'} 批量编码与逐条编码一致")
+
+    sys.exit(0 if all(results) and padding_ok else 1)